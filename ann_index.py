@@ -0,0 +1,88 @@
+import math
+import faiss
+import numpy as np
+
+# 벡터 인덱스 종류: flat (정확 검색), hnsw (그래프), ivf_flat (클러스터 + 원본 벡터), ivf_pq (클러스터 + PQ 압축 코드)
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+# 벡터 저장 형식별 FAISS 인코딩 (ivf_pq는 PQ 코드로 저장하므로 사용하지 않음)
+VECTOR_ENCODINGS = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+# IVF 학습에 필요한 클러스터당 최소 벡터 수 (FAISS 권장값)
+MIN_POINTS_PER_CENTROID = 39
+# 이보다 벡터가 적으면 IVF 인덱스를 학습하지 않고 같은 저장 형식의 정확 검색 인덱스로 생성
+MIN_IVF_VECTORS = 1000
+
+# 이전 버전에서 만든 인덱스 (manifest에 인덱스 설정이 없는 경우)
+FLAT_SPEC = {"type": "flat", "dtype": "float32"}
+
+def make_index_spec(index_type="flat", dtype="float32", nlist=0, pq_m=0, hnsw_m=32):
+    """Validate an index configuration and keep only the parameters its type uses (stored in the manifest)."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"지원하지 않는 인덱스 종류입니다: {index_type} (가능한 값: {', '.join(INDEX_TYPES)})")
+    if dtype not in VECTOR_ENCODINGS:
+        raise ValueError(f"지원하지 않는 벡터 저장 형식입니다: {dtype} (가능한 값: {', '.join(VECTOR_ENCODINGS)})")
+    if index_type == "ivf_pq":
+        return {"type": index_type, "nlist": nlist, "pq_m": pq_m}
+    spec = {"type": index_type, "dtype": dtype}
+    if index_type == "hnsw":
+        spec["hnsw_m"] = hnsw_m
+    elif index_type == "ivf_flat":
+        spec["nlist"] = nlist
+    return spec
+
+# 클러스터 수 자동 결정: 약 4√n개, 클러스터마다 학습 벡터가 충분하도록 제한
+def default_nlist(count):
+    return max(1, min(int(4 * math.sqrt(count)), count // MIN_POINTS_PER_CENTROID))
+
+# PQ 부분 공간 수 자동 결정: 차원을 나누어떨어지게 하면서 부분 공간 하나가 8차원 이상이 되는 가장 큰 값
+def default_pq_m(dim):
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+def factory_string(spec, dim, count):
+    """Resolve spec (auto parameters filled in for count vectors of dim) to a faiss.index_factory string."""
+    index_type = spec["type"]
+    if index_type.startswith("ivf") and count < MIN_IVF_VECTORS:
+        # 벡터가 적으면 클러스터 학습이 의미가 없으므로 정확 검색
+        print(f"벡터 {count}개는 {index_type} 학습에 부족하여 정확 검색 인덱스로 생성합니다")
+        return VECTOR_ENCODINGS[spec.get("dtype", "float32")]
+    if index_type == "flat":
+        return VECTOR_ENCODINGS[spec["dtype"]]
+    if index_type == "hnsw":
+        encoding = VECTOR_ENCODINGS[spec["dtype"]]
+        return f"HNSW{spec['hnsw_m']}" + ("" if encoding == "Flat" else f",{encoding}")
+    nlist = min(spec["nlist"] or default_nlist(count), count)
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},{VECTOR_ENCODINGS[spec['dtype']]}"
+    pq_m = spec["pq_m"] or default_pq_m(dim)
+    if dim % pq_m:
+        raise ValueError(f"PQ 부분 공간 수({pq_m})가 벡터 차원({dim})을 나누어떨어지게 하지 않습니다")
+    # 코드북 학습 벡터가 부족하면 부분 공간당 4비트 코드 사용
+    nbits = 8 if count >= 256 * MIN_POINTS_PER_CENTROID else 4
+    return f"IVF{nlist},PQ{pq_m}x{nbits}"
+
+def train_index(vectors, spec):
+    """Create an empty index for spec and train it on vectors (an (n, dim) float32 array). Vectors are not added."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    index = faiss.index_factory(dim, factory_string(spec, dim, count), faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    return index
+
+def supports_remove(spec):
+    """Only flat indexes can delete vectors in place; other types are rebuilt instead.
+
+    Flat indexes compact their labels on remove_ids, matching the renumbered index_to_docstore_id.
+    IVF lists keep the original labels (results would map to the wrong chunk) and HNSW cannot delete at all.
+    """
+    return spec["type"] == "flat"
+
+def search_params(index, nprobe=None, ef_search=None):
+    """Per-query search parameters for index (IVF nprobe / HNSW efSearch), or None for exact indexes."""
+    if nprobe and faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe)
+    if ef_search and hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(efSearch=ef_search)
+    return None
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+import numpy as np
+import hashlib
+import json
+import time
+
+# 질문 정규화: 앞뒤 공백 제거, 연속 공백 통일, 소문자화
+def normalize_question(question):
+    return " ".join(question.split()).lower()
+
+# 대화 이력 해시 (같은 이력에서 나온 답변끼리만 재사용)
+def conversation_hash(conversation):
+    return hashlib.sha256(json.dumps(conversation, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+# 반복되거나 거의 같은 질문의 답변을 재사용하는 메모리 캐시 (TTL + LRU)
+class AnswerCache:
+    def __init__(self, max_entries=1000, ttl=3600, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        # (namespace, 정규화된 질문) → (답변, 정규화된 질문 벡터, 만료 시각)
+        self._entries = OrderedDict()
+        # namespace → (키 목록, 벡터 행렬): 유사도 검색용, 항목이 바뀌면 다시 생성
+        self._matrices = {}
+        self.hits = {"exact": 0, "similar": 0}
+        self.misses = 0
+
+    @staticmethod
+    def namespace(index_version, prompt_hash, conversation):
+        """Entries are only shared between requests with the same index, prompt and history."""
+        return (index_version, prompt_hash, conversation_hash(conversation))
+
+    def get_exact(self, namespace, question):
+        key = (namespace, normalize_question(question))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        self.hits["exact"] += 1
+        return entry[0]
+
+    def get_similar(self, namespace, vector):
+        keys, matrix = self._matrix(namespace)
+        if not keys:
+            self.misses += 1
+            return None
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = matrix @ query
+        # 기준 이상인 항목을 유사도 순으로 확인: 만료된 항목은 제거하고 다음으로 유사한 항목 사용
+        candidates = np.flatnonzero(scores >= self.similarity_threshold)
+        now = time.monotonic()
+        answer, expired = None, []
+        for index in candidates[np.argsort(-scores[candidates], kind="stable")]:
+            key = keys[index]
+            entry = self._entries[key]
+            if entry[2] < now:
+                expired.append(key)
+                continue
+            self._entries.move_to_end(key)
+            answer = entry[0]
+            break
+        for key in expired:
+            self._remove(key)
+        if answer is None:
+            self.misses += 1
+            return None
+        self.hits["similar"] += 1
+        return answer
+
+    def put(self, namespace, question, vector, answer):
+        key = (namespace, normalize_question(question))
+        normalized = None
+        if vector is not None:
+            normalized = np.asarray(vector, dtype=np.float32)
+            normalized /= np.linalg.norm(normalized) or 1.0
+        self._entries[key] = (answer, normalized, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        self._matrices.pop(namespace, None)
+        # 가장 오래 사용되지 않은 항목부터 제거
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._matrices.pop(key[0], None)
+
+    def _matrix(self, namespace):
+        if namespace not in self._matrices:
+            keys = [key for key, entry in self._entries.items() if key[0] == namespace and entry[1] is not None]
+            matrix = np.stack([self._entries[key][1] for key in keys]) if keys else None
+            self._matrices[namespace] = (keys, matrix)
+        return self._matrices[namespace]
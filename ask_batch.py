@@ -0,0 +1,105 @@
+"""Answer a file of questions through the server's /ask/batch endpoint.
+
+Usage: python ask_batch.py questions.txt [--output answers.jsonl] [--concurrency 8]
+       cat questions.jsonl | python ask_batch.py - --api-base http://127.0.0.1:8000
+Input is one question per line, or JSON lines with a "question" field. Results are written as JSON lines
+(index, question, answer, cached) in the order they finish; "index" is the line number in the input.
+Answers are also stored in the server's answer cache, so this can pre-warm frequently asked questions.
+"""
+from config import BATCH_MAX_QUESTIONS
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+def read_questions(file):
+    questions = []
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            line = json.loads(line)["question"]
+        questions.append(line)
+    return questions
+
+# 질문을 batch_size개씩 나눠서 보내고 도착하는 이벤트를 하나씩 전달
+def iter_events(session, url, api_key, questions, batch_size, concurrency):
+    for offset in range(0, len(questions), batch_size):
+        payload = {"api_key": api_key, "questions": questions[offset:offset + batch_size]}
+        if concurrency:
+            payload["concurrency"] = concurrency
+        with session.post(url, json=payload, stream=True) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"서버 응답 오류 ({response.status_code}): {response.text}")
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "index" in event:
+                    event["index"] += offset
+                yield event
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="질문 파일 (한 줄에 질문 하나 또는 JSON lines, -이면 표준 입력)")
+    parser.add_argument("--output", default=None, help="결과 JSON lines 파일 (지정하지 않으면 표준 출력)")
+    parser.add_argument("--api-base", default=os.getenv("API_BASE", "http://127.0.0.1:8000"), help="API 서버 주소")
+    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY"), help="OpenAI API 키")
+    parser.add_argument("--batch-size", type=int, default=BATCH_MAX_QUESTIONS, help="요청 하나에 보낼 질문 수")
+    parser.add_argument("--concurrency", type=int, default=None, help="동시에 실행할 LLM 호출 수 (서버 설정 이하)")
+    args = parser.parse_args()
+    if not args.api_key:
+        print("API 키가 없습니다 (--api-key 또는 OPENAI_API_KEY)")
+        return 1
+
+    if args.input == "-":
+        questions = read_questions(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as file:
+            questions = read_questions(file)
+    if not questions:
+        print("질문이 없습니다")
+        return 1
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    counts = {"cached": 0, "generated": 0, "errors": 0}
+    started = time.perf_counter()
+    try:
+        with requests.Session() as session:
+            for event in iter_events(
+                session, f"{args.api_base}/ask/batch", args.api_key, questions, args.batch_size, args.concurrency
+            ):
+                if event["type"] == "done":
+                    continue
+                if event["type"] == "error" and "index" not in event:
+                    # 요청 전체가 실패한 경우 (인덱스 로드 실패 등)
+                    raise RuntimeError(event["detail"])
+                if event["type"] == "error":
+                    counts["errors"] += 1
+                    record = {"index": event["index"], "question": event["question"], "error": event["detail"]}
+                else:
+                    counts["cached" if event["cached"] else "generated"] += 1
+                    record = {key: event[key] for key in ("index", "question", "answer", "cached")}
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+    except (requests.RequestException, RuntimeError) as e:
+        print(f"일괄 질문 중 오류 발생: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    seconds = time.perf_counter() - started
+    print(
+        f"질문 {len(questions)}개 (생성 {counts['generated']}, 캐시 {counts['cached']}, 실패 {counts['errors']}) "
+        f"{seconds:.1f} s, 초당 {len(questions) / seconds:.1f}개",
+        file=sys.stderr,
+    )
+    return 1 if counts["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Recall / latency / memory of the FAISS index types on synthetic corpora.
+
+Usage: python -m bench.ann_report --sizes 10000,100000 --dim 256
+       python -m bench.ann_report --sizes 1000000 --configs flat,hnsw:int8,ivf_pq --output ann.json
+Builds each index type the way build_index does (ann_index.train_index), searches it one query at a time
+like the server does for every nprobe / efSearch value, and reports recall@k against exact search,
+p50/p99 latency, build time and index size. Vectors are clustered Gaussian points normalized to unit length
+(like text embeddings); queries are perturbed corpus vectors.
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from ann_index import make_index_spec, search_params, train_index
+
+# 기본 비교 대상: 인덱스 종류[:저장 형식]
+DEFAULT_CONFIGS = "flat,flat:float16,flat:int8,hnsw,hnsw:int8,ivf_flat,ivf_flat:int8,ivf_pq"
+
+# 군집 구조가 있는 단위 벡터 (임베딩과 비슷한 분포)
+def synthetic_vectors(count, dim, rng, clusters=1000):
+    centers = rng.standard_normal((min(clusters, count), dim), dtype=np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    # 1M개도 메모리를 두 배로 쓰지 않도록 블록 단위로 생성
+    for start in range(0, count, 100000):
+        end = min(start + 100000, count)
+        assignment = rng.integers(0, len(centers), end - start)
+        vectors[start:end] = centers[assignment] + 0.5 * rng.standard_normal((end - start, dim), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def make_queries(vectors, count, rng):
+    queries = vectors[rng.integers(0, len(vectors), count)] + 0.05 * rng.standard_normal(
+        (count, vectors.shape[1]), dtype=np.float32
+    )
+    faiss.normalize_L2(queries)
+    return queries
+
+def parse_config(text):
+    index_type, _, dtype = text.partition(":")
+    return make_index_spec(index_type, dtype or "float32")
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(row) & set(expected)) / k for row, expected in zip(found, truth)]))
+
+# 질의를 하나씩 검색 (서버의 요청 단위 검색과 같은 방식)
+def search_one_by_one(index, queries, k, params):
+    found = np.empty((len(queries), k), dtype=np.int64)
+    seconds = []
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        _, indices = index.search(query[None, :], k, params=params)
+        seconds.append(time.perf_counter() - started)
+        found[i] = indices[0]
+    ms = np.asarray(seconds) * 1000
+    return found, float(np.percentile(ms, 50)), float(np.percentile(ms, 99))
+
+# 인덱스 종류별로 의미 있는 검색 조정값 (정확 검색 인덱스는 조정값 없음)
+def knob_values(index, nprobes, ef_searches):
+    if faiss.try_extract_index_ivf(index) is not None:
+        return [("nprobe", value) for value in nprobes]
+    if hasattr(index, "hnsw"):
+        return [("ef_search", value) for value in ef_searches]
+    return [(None, None)]
+
+def bench_size(count, args, rng):
+    vectors = synthetic_vectors(count, args.dim, rng)
+    queries = make_queries(vectors, args.queries, rng)
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+    del exact
+
+    rows = []
+    for config in args.configs.split(","):
+        spec = parse_config(config)
+        started = time.perf_counter()
+        index = train_index(vectors, spec)
+        index.add(vectors)
+        build_s = time.perf_counter() - started
+        size_mb = faiss.serialize_index(index).nbytes / 2**20
+        for knob, value in knob_values(index, args.nprobe, args.ef_search):
+            params = search_params(index, **({knob: value} if knob else {}))
+            found, p50, p99 = search_one_by_one(index, queries, args.k, params)
+            row = {
+                "vectors": count, "config": config, "index": type(index).__name__,
+                "knob": f"{knob}={value}" if knob else "-", f"recall_at_{args.k}": recall_at_k(found, truth),
+                "p50_ms": p50, "p99_ms": p99, "build_s": build_s, "index_mb": size_mb,
+                "bytes_per_vector": size_mb * 2**20 / count,
+            }
+            rows.append(row)
+            print(
+                f"{count:>9} {config:<14}{row['knob']:<14}{row[f'recall_at_{args.k}']:>8.3f}{p50:>9.3f}{p99:>9.3f}"
+                f"{build_s:>9.1f}{size_mb:>10.1f}{row['bytes_per_vector']:>9.0f}",
+                flush=True,
+            )
+        del index
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000", help="코퍼스 벡터 수 (쉼표로 구분, 예: 10000,100000,1000000)")
+    parser.add_argument("--dim", type=int, default=256, help="벡터 차원 (ada-002는 1536)")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help="인덱스 종류[:float32|float16|int8] 목록")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", default="1,4,16,64", help="IVF 인덱스에서 비교할 nprobe 값")
+    parser.add_argument("--ef-search", default="16,64,256", help="HNSW 인덱스에서 비교할 efSearch 값")
+    parser.add_argument("--output", default=None, help="결과 JSON 파일")
+    args = parser.parse_args()
+    args.nprobe = [int(value) for value in args.nprobe.split(",")]
+    args.ef_search = [int(value) for value in args.ef_search.split(",")]
+
+    rng = np.random.default_rng(0)
+    print(
+        f"{'vectors':>9} {'config':<14}{'knob':<14}{f'recall@{args.k}':>8}{'p50 ms':>9}{'p99 ms':>9}"
+        f"{'build s':>9}{'index MB':>10}{'B/vec':>9}"
+    )
+    rows = []
+    for count in (int(value) for value in args.sizes.split(",")):
+        rows.extend(bench_size(count, args, rng))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"dim": args.dim, "k": args.k, "queries": args.queries, "results": rows}, file, indent=2)
+
+if __name__ == "__main__":
+    main()
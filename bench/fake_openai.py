@@ -0,0 +1,92 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+import numpy as np
+import asyncio
+import base64
+import hashlib
+import json
+import time
+
+# OpenAI chat / embeddings API를 흉내 내는 로컬 가짜 서버 (부하 테스트용)
+# llm_latency: 첫 토큰까지의 지연, token_rate: 초당 생성 토큰 수
+def create_app(llm_latency=0.5, embed_latency=0.05, embed_dim=1536, token_rate=200.0, answer_tokens=50):
+    app = FastAPI()
+    tokens = [f"토큰{i} " for i in range(answer_tokens)]
+    answer = "".join(tokens)
+
+    # 입력 텍스트로부터 항상 같은 정규화 벡터 생성
+    def fake_vector(item):
+        seed = int.from_bytes(hashlib.sha256(repr(item).encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(embed_dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"]
+        # 문자열 하나 또는 토큰 배열 하나만 온 경우 리스트로 감싸기
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        await asyncio.sleep(embed_latency)
+        data = []
+        for i, item in enumerate(inputs):
+            vector = fake_vector(item)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    # 스트리밍 요청: SSE 형식으로 토큰을 token_rate 속도로 전송
+    async def stream_chunks(model):
+        await asyncio.sleep(llm_latency)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(1 / token_rate)
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": token}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        done = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake-llm")
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(model), media_type="text/event-stream")
+        await asyncio.sleep(llm_latency + len(tokens) / token_rate)
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+        }
+
+    return app
@@ -0,0 +1,114 @@
+"""Regression check: incremental builds that remove chunks keep every FAISS label mapped to the right chunk.
+
+Usage: python -m bench.incremental_check [--chunks 1500] [--types flat,hnsw,ivf_flat,ivf_pq]
+For each index type builds an index over synthetic chunks with the local hashed_ngram backend, deletes and
+changes a few chunks, rebuilds incrementally, then loads the index (pickle and mmap) and checks that the
+labels stored in the index are exactly 0..n-1 and that searching each sampled chunk's own text finds that
+chunk. Exits with 1 on any mismatch.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+import faiss
+
+from ann_index import INDEX_TYPES, make_index_spec
+from model import build_index, load_vector_store, make_embeddings
+from retrieval import vector_search
+
+# 지역 / 업종 / 주제 단어를 섞어서 서로 구분되는 청크 본문 생성
+WORDS = ["제주", "서귀포", "애월", "성산", "감귤", "카페", "숙박", "관광", "창업", "지원금", "임대료", "상권",
+         "마케팅", "브랜딩", "온라인", "체험", "농가", "해녀", "수산물", "식당", "공방", "게스트하우스", "렌터카"]
+
+def write_chunks(folder, count, rng):
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        content = f"c{i:04d} " + " ".join(rng.choice(WORDS) for _ in range(40))
+        with open(os.path.join(folder, f"c{i:04d}.json"), "w", encoding="utf-8") as file:
+            json.dump({"content": content}, file, ensure_ascii=False)
+
+# 인덱스에 실제로 저장된 라벨 (IVF는 역리스트에 기록된 id, 나머지는 0..ntotal-1)
+def stored_labels(index):
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return set(range(index.ntotal))
+    labels = set()
+    for list_no in range(ivf.nlist):
+        size = ivf.invlists.list_size(list_no)
+        if size:
+            labels.update(faiss.rev_swig_ptr(ivf.invlists.get_ids(list_no), size).tolist())
+    return labels
+
+def check_store(vectorstore, embeddings, chunks_folder, sample, exact_search):
+    errors = []
+    labels = stored_labels(vectorstore.index)
+    expected = set(range(len(vectorstore.index_to_docstore_id)))
+    if labels != expected:
+        errors.append(f"저장된 라벨 {len(labels - expected)}개가 문서 id 범위 밖, {len(expected - labels)}개 누락")
+    if not exact_search:
+        return errors
+    nlist = getattr(faiss.try_extract_index_ivf(vectorstore.index), "nlist", None)
+    for name in sample:
+        with open(os.path.join(chunks_folder, name), "r", encoding="utf-8") as file:
+            content = json.load(file)["content"]
+        try:
+            doc_ids = vector_search(vectorstore, embeddings.embed_query(content), 1, nprobe=nlist, ef_search=256)
+        except KeyError as e:
+            errors.append(f"{name}: 문서 id에 없는 라벨 {e}")
+            continue
+        found = vectorstore.docstore.search(doc_ids[0]).metadata["chunk"] if doc_ids else None
+        if found != name:
+            errors.append(f"{name}: {found} 반환")
+    return errors
+
+def check_type(index_type, count, rng):
+    workdir = tempfile.mkdtemp(prefix=f"incremental-{index_type}-")
+    chunks_folder = os.path.join(workdir, "chunks")
+    index_path = os.path.join(workdir, "vectorstore", "faiss_index")
+    corpus_path = os.path.join(workdir, "vectorstore", "chunks.corpus")
+    write_chunks(chunks_folder, count, rng)
+    spec = make_index_spec(index_type)
+    build = lambda: build_index(
+        chunks_folder, index_path, corpus_path=corpus_path, index_spec=spec, embedding_backend="hashed_ngram"
+    )
+    build()
+
+    # 앞쪽 청크 삭제와 중간 청크 변경 (뒤쪽 청크의 라벨이 밀리는지 확인)
+    os.remove(os.path.join(chunks_folder, "c0001.json"))
+    with open(os.path.join(chunks_folder, f"c{count // 2:04d}.json"), "w", encoding="utf-8") as file:
+        json.dump({"content": f"c{count // 2:04d} 내용이 바뀐 청크 " + " ".join(WORDS)}, file, ensure_ascii=False)
+    _, stats = build()
+
+    embeddings = make_embeddings(backend="hashed_ngram")
+    names = sorted(os.listdir(chunks_folder))
+    sample = sorted(set(rng.sample(names, min(50, len(names))) + names[:3] + names[-3:]))
+    # PQ 압축 인덱스는 자기 자신도 1위가 아닐 수 있으므로 라벨 범위만 확인
+    exact_search = index_type != "ivf_pq"
+    errors = []
+    for mmap in (False, True):
+        vectorstore = load_vector_store(index_path, embeddings, mmap=mmap)
+        errors += [f"{'mmap' if mmap else 'pickle'} {error}" for error in
+                   check_store(vectorstore, embeddings, chunks_folder, sample, exact_search)]
+    return stats, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=1500, help="청크 수 (IVF 학습에는 1000개 이상 필요)")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES), help="확인할 인덱스 종류")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    failed = False
+    for index_type in args.types.split(","):
+        stats, errors = check_type(index_type, args.chunks, rng)
+        print(f"{index_type:<9} 삭제 {stats['removed']} 추가 {stats['added']} → {'OK' if not errors else 'FAIL'}")
+        for error in errors[:10]:
+            print(f"  {error}")
+        failed = failed or bool(errors)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
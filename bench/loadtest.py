@@ -0,0 +1,84 @@
+"""Concurrent /ask load test against a local fake OpenAI server.
+
+Usage: python -m bench.loadtest --concurrency 1,2,4,8,16 --requests 32 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+
+# 빈 포트 찾기
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# uvicorn 서버를 백그라운드 스레드에서 실행
+def start_uvicorn(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+# 동시 실행 수를 제한하면서 /ask 요청을 보내고 처리량 측정
+# 요청마다 다른 질문을 보내서 답변 캐시 / 동일 질문 합치기 없이 실제 생성 경로를 측정 (tag로 측정 단계끼리도 구분)
+async def run_level(url, concurrency, total, tag=""):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        async def one(i):
+            async with semaphore:
+                payload = {"api_key": "sk-fake", "question": f"제주 지역 창업 아이템 추천 {tag}-{i}"}
+                response = await client.post(url, json=payload)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+    return elapsed, total / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,2,4,8,16")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    fake_port, api_port = free_port(), free_port()
+    workdir = tempfile.mkdtemp(prefix="jejujoa-loadtest-")
+    # server 모듈을 임포트하기 전에 가짜 서버 주소와 임시 인덱스 위치를 지정
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/v1"
+    os.environ["INDEX_PATH"] = os.path.join(workdir, "faiss_index")
+    os.environ["CORPUS_PATH"] = os.path.join(workdir, "chunks.corpus")
+    os.environ["EMBED_TOKENIZE"] = "0"
+    os.environ["EMBED_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite")
+    os.environ["SESSION_DB_PATH"] = os.path.join(workdir, "sessions.sqlite")
+
+    from bench.fake_openai import create_app
+    import server
+
+    start_uvicorn(create_app(llm_latency=args.llm_latency, embed_latency=args.embed_latency), fake_port)
+    start_uvicorn(server.app, api_port)
+    url = f"http://127.0.0.1:{api_port}/ask"
+
+    # 첫 요청에서 인덱스를 생성하므로 측정 전에 한 번 호출
+    asyncio.run(run_level(url, 1, 1, "warmup"))
+
+    print(f"{'concurrency':>12} {'requests':>9} {'elapsed(s)':>11} {'req/s':>8}")
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        elapsed, throughput = asyncio.run(run_level(url, concurrency, args.requests, f"c{concurrency}"))
+        print(f"{concurrency:>12} {args.requests:>9} {elapsed:>11.2f} {throughput:>8.2f}")
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
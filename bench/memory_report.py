@@ -0,0 +1,94 @@
+"""Per-worker memory of the vector store with pickle vs mmap index storage.
+
+Usage: python -m bench.memory_report --chunks 20000 --workers 4
+Builds a synthetic index, starts N worker processes per storage mode, loads the FAISS store in each and
+searches it, then reports RSS / PSS / private (anonymous) memory per worker while all are alive.
+The BM25 index is loaded the same way in both modes and is left out of the measurement.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+
+# 프로세스의 메모리 사용량 (MB): 전체 RSS, 공유 페이지를 나눠 계산한 PSS, 프로세스 전용 익명 메모리
+def memory_usage(pid="self"):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file.readlines()[1:]:
+            key, value = line.split(":")
+            values[key] = int(value.split()[0]) / 1024
+    return {"rss": values["Rss"], "pss": values["Pss"], "private": values["Anonymous"]}
+
+# 가짜 청크와 벡터로 인덱스 생성
+def build_synthetic_index(index_path, chunks, dim):
+    from langchain.vectorstores import FAISS
+    from langchain_openai import OpenAIEmbeddings
+    from model import save_vector_store_atomic, embedding_identity
+
+    rng = np.random.default_rng(0)
+    with open(os.path.join("data", "chunks", "chunk_1.json"), encoding="utf-8") as file:
+        sample = file.read()
+    texts = [f"{sample[i % 500:i % 500 + 800]} #{i}" for i in range(chunks)]
+    vectors = rng.random((chunks, dim), dtype=np.float32)
+    ids = [f"chunk_{i}.json#{i:016x}" for i in range(chunks)]
+    metadatas = [{"chunk": f"chunk_{i}.json", "hash": f"{i:064x}"} for i in range(chunks)]
+    vectorstore = FAISS.from_embeddings(
+        list(zip(texts, vectors.tolist())), OpenAIEmbeddings(openai_api_key="unused"), metadatas=metadatas, ids=ids
+    )
+    save_vector_store_atomic(vectorstore, index_path, {}, embedding_identity("openai", "synthetic"))
+
+# 워커 하나: 인덱스를 로드하고 검색한 뒤, 모든 워커가 로드를 마친 상태에서 메모리 측정
+def worker(index_path, mmap, dim, barrier, results):
+    from model import load_vector_store
+    from retrieval import vector_search, docs_for_ids
+
+    before = memory_usage()
+    vectorstore = load_vector_store(index_path, mmap=mmap)
+    rng = np.random.default_rng(os.getpid())
+    for _ in range(20):
+        docs_for_ids(vectorstore, vector_search(vectorstore, rng.random(dim, dtype=np.float32), 5))
+    barrier.wait()
+    after = memory_usage()
+    results.put({key: after[key] - before[key] for key in after})
+    barrier.wait()
+
+def measure(index_path, mmap, workers, dim):
+    # uvicorn 워커처럼 spawn으로 새 프로세스를 띄움
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(index_path, mmap, dim, barrier, results)) for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    usages = [results.get() for _ in range(workers)]
+    for process in processes:
+        process.join()
+    return usages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="jejujoa-memory-")
+    index_path = os.path.join(workdir, "faiss_index")
+    build_synthetic_index(index_path, args.chunks, args.dim)
+    size = sum(os.path.getsize(f"{index_path}.{ext}") for ext in ("faiss", "docs"))
+    print(f"청크 {args.chunks}개, {args.dim}차원, 워커 {args.workers}개 (인덱스 + 문서 파일 {size / 2**20:.0f} MB)")
+    print(f"{'mode':<8}{'RSS/worker':>14}{'PSS/worker':>14}{'private/worker':>16}{'PSS total':>12}")
+    for mode in ("pickle", "mmap"):
+        usages = measure(index_path, mode == "mmap", args.workers, args.dim)
+        mean = {key: sum(usage[key] for usage in usages) / len(usages) for key in usages[0]}
+        print(
+            f"{mode:<8}{mean['rss']:>11.0f} MB{mean['pss']:>11.0f} MB{mean['private']:>13.0f} MB"
+            f"{mean['pss'] * len(usages):>9.0f} MB"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Offline benchmark suite: the real server.app against the local fake OpenAI server.
+
+Usage: python -m bench.suite --output results.json
+       python -m bench.suite --compare before.json after.json
+Measures index build time (setup_vector_store), retrieval time, /ask and /ask/stream latency
+(p50/p95/p99) and throughput at several concurrency levels, ChatHistoryManager operations and
+memory. The fake OpenAI server and server.app each run in their own process so the client
+does not compete with them for the GIL. Results are flat "group.metric" keys in a JSON file so runs from different
+commits can be compared; --compare exits with 1 when a metric got worse by more than --threshold.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from bench.loadtest import free_port
+from bench.memory_report import memory_usage
+
+QUESTION = "제주 지역 창업 아이템 추천"
+
+# 값이 클수록 좋은 지표 (나머지는 작을수록 좋음)
+HIGHER_IS_BETTER = ("rps", "chunks_per_s")
+
+# 지연 시간 목록(초)을 ms 단위 p50/p95/p99로 요약
+def percentiles(seconds, prefix=""):
+    ms = np.asarray(seconds) * 1000
+    return {
+        f"{prefix}p50_ms": float(np.percentile(ms, 50)),
+        f"{prefix}p95_ms": float(np.percentile(ms, 95)),
+        f"{prefix}p99_ms": float(np.percentile(ms, 99)),
+    }
+
+# 별도 프로세스에서 실행할 서버들 (spawn이라 모듈 최상위 함수여야 함)
+def serve_fake_openai(port, options):
+    import uvicorn
+    from bench.fake_openai import create_app
+
+    uvicorn.run(create_app(**options), host="127.0.0.1", port=port, log_level="warning")
+
+def serve_api(port):
+    import uvicorn
+    import server
+
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning")
+
+# 서버 프로세스를 띄우고 url이 200 (또는 200~499) 응답을 줄 때까지 대기
+def start_process(target, args, url, timeout=120):
+    import multiprocessing
+
+    process = multiprocessing.get_context("spawn").Process(target=target, args=args, daemon=True)
+    process.start()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not process.is_alive():
+            raise RuntimeError(f"서버 프로세스가 종료되었습니다: {target.__name__}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"서버가 {timeout}초 안에 준비되지 않았습니다: {url}")
+
+# 인덱스 빌드: 임베딩 캐시가 빈 상태의 전체 빌드와 변경 없는 재빌드
+def bench_build(chunks_folder, index_path):
+    from model import build_index, setup_vector_store
+    from config import EMBEDDING_MODEL
+
+    started = time.perf_counter()
+    vectorstore = setup_vector_store(chunks_folder, index_path, EMBEDDING_MODEL, api_key="sk-fake")
+    cold = time.perf_counter() - started
+    chunks = len(vectorstore.index_to_docstore_id)
+    _, stats = build_index(chunks_folder, index_path, EMBEDDING_MODEL, api_key="sk-fake")
+    return {
+        "chunks": chunks,
+        "cold_s": cold,
+        "chunks_per_s": chunks / cold,
+        "noop_s": stats["seconds"],
+    }
+
+# 검색 시간: 서버와 같은 스냅샷으로 BM25, FAISS, 하이브리드 검색을 각각 측정
+def bench_retrieval(queries):
+    from retrieval import hybrid_search
+    from config import CONTEXT_CANDIDATES, RETRIEVAL_CANDIDATES
+    import server
+
+    server.index_manager.load()
+    vectorstore, _, lexical = server.index_manager.snapshot()
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((queries, vectorstore.index.d)).astype(np.float32)
+    questions = [f"{QUESTION} {i}" for i in range(queries)]
+
+    results = {}
+    modes = {"lexical": (lexical, None), "vector": (None, vectors), "hybrid": (lexical, vectors)}
+    for mode, (mode_lexical, mode_vectors) in modes.items():
+        if mode != "vector" and lexical is None:
+            continue
+        timings = []
+        for i, question in enumerate(questions):
+            started = time.perf_counter()
+            hybrid_search(
+                vectorstore, mode_lexical, question, None if mode_vectors is None else mode_vectors[i],
+                k=CONTEXT_CANDIDATES, candidates=RETRIEVAL_CANDIDATES,
+            )
+            timings.append(time.perf_counter() - started)
+        results.update(percentiles(timings, f"{mode}_"))
+    return results
+
+# /ask 또는 /ask/stream 요청을 동시 실행 수를 제한하면서 보내고 요청별 지연 시간 기록
+# 답변 캐시에 걸리지 않도록 요청마다 다른 질문 사용
+async def run_requests(base_url, path, concurrency, total, tag):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, ttfts = [], []
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        async def one(i):
+            payload = {"api_key": "sk-fake", "question": f"{QUESTION} {tag}-{i}"}
+            async with semaphore:
+                started = time.perf_counter()
+                if path == "/ask":
+                    response = await client.post(base_url + path, json=payload)
+                    response.raise_for_status()
+                else:
+                    ttft = None
+                    async with client.stream("POST", base_url + path, json=payload) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            event = json.loads(line)
+                            if event["type"] == "error":
+                                raise RuntimeError(event["detail"])
+                            # 클라이언트에서 본 첫 토큰 도착 시간
+                            if event["type"] == "token" and ttft is None:
+                                ttft = time.perf_counter() - started
+                    ttfts.append(ttft)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    results = {**percentiles(latencies), "rps": total / elapsed}
+    if ttfts:
+        results.update(percentiles(ttfts, "ttft_"))
+    return results
+
+def bench_endpoints(levels, total):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    # 인덱스 로드와 워밍업이 끝나야 /ready가 200
+    process = start_process(serve_api, (port,), f"{base_url}/ready")
+    # 연결과 클라이언트 초기화가 측정에 포함되지 않도록 한 번 호출
+    asyncio.run(run_requests(base_url, "/ask", 1, 1, "warmup"))
+
+    results = {}
+    for path, name in (("/ask", "ask"), ("/ask/stream", "stream")):
+        for concurrency in levels:
+            level = asyncio.run(run_requests(base_url, path, concurrency, total, f"{name}{concurrency}"))
+            results.update({f"{name}.c{concurrency}.{key}": value for key, value in level.items()})
+
+    # 부하를 받은 뒤의 서버 프로세스 메모리
+    usage = memory_usage(process.pid)
+    results.update({"server.rss_mb": usage["rss"], "server.private_mb": usage["private"]})
+    process.terminate()
+    process.join()
+    return results
+
+# 대화 기록: 저장, 첫 페이지/이전 페이지 조회, 검색 (세션 200개에 메시지를 나눠서 저장)
+def bench_history(db_path, messages):
+    from stream import ChatHistoryManager
+
+    history = ChatHistoryManager(db_path)
+    sessions = [f"bench-session-{i:04d}" for i in range(200)]
+    rng = np.random.default_rng(0)
+    words = "제주 창업 아이템 추천 정부 지원 자금 확보 게스트하우스 감귤 특산물 카페 관광 체험 농업".split()
+
+    timings = []
+    for i in range(messages // 2):
+        question = " ".join(rng.choice(words, 12))
+        started = time.perf_counter()
+        history.add_turn(question, f"{question} 에 대한 답변입니다.", sessions[i % len(sessions)])
+        timings.append(time.perf_counter() - started)
+    results = percentiles(timings, "add_turn_")
+
+    session_id = sessions[7]
+    first, deep, search = [], [], []
+    for _ in range(50):
+        started = time.perf_counter()
+        _, cursor = history.get_messages_page(session_id, limit=20)
+        first.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        history.get_messages_page(session_id, cursor=cursor, limit=20)
+        deep.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        history.search_messages("게스트하우스", session_id, limit=10)
+        search.append(time.perf_counter() - started)
+    results.update(percentiles(first, "page_"))
+    results.update(percentiles(deep, "next_page_"))
+    results.update(percentiles(search, "search_"))
+    return results
+
+# 빌드, 검색, 대화 기록 측정을 실행한 벤치마크 프로세스의 메모리
+def bench_memory():
+    usage = memory_usage()
+    return {
+        "rss_mb": usage["rss"],
+        "private_mb": usage["private"],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# 두 결과 파일 비교: 공통 지표의 변화율을 출력하고 기준보다 나빠진 지표 수 반환
+def compare(before_path, after_path, threshold):
+    with open(before_path, encoding="utf-8") as file:
+        before = json.load(file)
+    with open(after_path, encoding="utf-8") as file:
+        after = json.load(file)
+    print(f"{before['meta']['commit']} → {after['meta']['commit']}")
+    print(f"{'metric':<32}{'before':>12}{'after':>12}{'change':>10}")
+    regressions = 0
+    for key in sorted(before["results"].keys() & after["results"].keys()):
+        old, new = before["results"][key], after["results"][key]
+        change = (new - old) / old if old else 0.0
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        flag = "  <- 악화" if worse > threshold else ""
+        regressions += bool(flag)
+        print(f"{key:<32}{old:>12.2f}{new:>12.2f}{change:>+9.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=None, help="결과 JSON 파일 (없으면 표준 출력)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="두 결과 파일 비교")
+    parser.add_argument("--threshold", type=float, default=0.1, help="--compare에서 악화로 볼 변화율")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=32, help="동시 실행 수 단계마다 보낼 요청 수")
+    parser.add_argument("--queries", type=int, default=200, help="검색 시간 측정에 사용할 질의 수")
+    parser.add_argument("--history-messages", type=int, default=20000)
+    parser.add_argument("--chunks", default="./data/chunks/", help="인덱스를 만들 청크 폴더")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--token-rate", type=float, default=200.0)
+    parser.add_argument("--answer-tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    fake_port = free_port()
+    workdir = tempfile.mkdtemp(prefix="jejujoa-bench-")
+    # server 모듈을 임포트하기 전에 가짜 서버 주소와 임시 저장 위치를 지정
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/v1"
+    os.environ["INDEX_PATH"] = os.path.join(workdir, "faiss_index")
+    os.environ["CORPUS_PATH"] = os.path.join(workdir, "chunks.corpus")
+    os.environ["EMBED_TOKENIZE"] = "0"
+    os.environ["EMBED_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite")
+    os.environ["SESSION_DB_PATH"] = os.path.join(workdir, "sessions.sqlite")
+
+    fake_options = {
+        "llm_latency": args.llm_latency, "embed_latency": args.embed_latency,
+        "token_rate": args.token_rate, "answer_tokens": args.answer_tokens,
+    }
+    fake_process = start_process(serve_fake_openai, (fake_port, fake_options), f"http://127.0.0.1:{fake_port}/")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    results = {}
+    steps = (
+        ("build", lambda: bench_build(args.chunks, os.environ["INDEX_PATH"])),
+        ("retrieval", lambda: bench_retrieval(args.queries)),
+        ("endpoints", lambda: bench_endpoints(levels, args.requests)),
+        ("history", lambda: bench_history(os.path.join(workdir, "chat_history.db"), args.history_messages)),
+        ("memory", bench_memory),
+    )
+    for name, step in steps:
+        started = time.perf_counter()
+        step_results = step()
+        prefix = "" if name == "endpoints" else f"{name}."
+        results.update({f"{prefix}{key}": value for key, value in step_results.items()})
+        print(f"{name} 완료 ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+    fake_process.terminate()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+        for key, value in results.items():
+            print(f"{key:<32}{value:>12.2f}")
+    else:
+        print(text)
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Incrementally build the FAISS index from data/chunks.
+
+Usage: python build_index.py [--chunks ./data/chunks/] [--index ./data/vectorstore/faiss_index]
+       python build_index.py --index-type ivf_pq --retrain
+The OpenAI API key is read from --api-key or the OPENAI_API_KEY environment variable.
+"""
+from model import build_index
+from ann_index import INDEX_TYPES, VECTOR_ENCODINGS, make_index_spec
+from config import (
+    INDEX_PATH, CHUNKS_FOLDER, CORPUS_PATH, EMBEDDING_MODEL, EMBED_BATCH_SIZE, EMBED_MAX_IN_FLIGHT,
+    INDEX_TYPE, INDEX_VECTOR_DTYPE, INDEX_NLIST, INDEX_PQ_M, INDEX_HNSW_M, EMBEDDING_BACKEND,
+)
+from embedding_backends import EMBEDDING_BACKENDS
+import argparse
+import os
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", default=CHUNKS_FOLDER, help="청크 JSON 폴더")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="청크 코퍼스 파일 경로")
+    parser.add_argument("--index", default=INDEX_PATH, help="인덱스 저장 경로 (확장자 제외)")
+    parser.add_argument("--embedding-backend", choices=EMBEDDING_BACKENDS, default=EMBEDDING_BACKEND,
+                        help="임베딩 백엔드 (서버의 EMBEDDING_BACKEND와 같아야 함)")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="임베딩 모델 (openai 백엔드)")
+    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY"), help="OpenAI API 키")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="임베딩 요청 한 번에 보낼 청크 수")
+    parser.add_argument("--max-in-flight", type=int, default=EMBED_MAX_IN_FLIGHT, help="동시에 진행할 배치 수")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=INDEX_TYPE, help="벡터 인덱스 종류")
+    parser.add_argument("--dtype", choices=list(VECTOR_ENCODINGS), default=INDEX_VECTOR_DTYPE, help="벡터 저장 형식")
+    parser.add_argument("--nlist", type=int, default=INDEX_NLIST, help="IVF 클러스터 수 (0이면 자동)")
+    parser.add_argument("--pq-m", type=int, default=INDEX_PQ_M, help="PQ 부분 공간 수 (0이면 자동)")
+    parser.add_argument("--hnsw-m", type=int, default=INDEX_HNSW_M, help="HNSW 노드당 이웃 수")
+    parser.add_argument("--retrain", action="store_true", help="변경이 없어도 전체 청크로 인덱스를 다시 학습")
+    args = parser.parse_args()
+
+    index_spec = make_index_spec(args.index_type, args.dtype, args.nlist, args.pq_m, args.hnsw_m)
+    vectorstore, stats = build_index(
+        args.chunks, args.index, args.model, api_key=args.api_key,
+        batch_size=args.batch_size, max_in_flight=args.max_in_flight, corpus_path=args.corpus,
+        index_spec=index_spec, retrain=args.retrain, embedding_backend=args.embedding_backend,
+    )
+    status = "변경 없음" if vectorstore is None else "인덱스 갱신"
+    print(
+        f"{status}: 추가 {stats['added']}, 삭제 {stats['removed']}, 유지 {stats['unchanged']} "
+        f"({stats['seconds'] * 1000:.1f} ms)"
+    )
+    if stats.get("embedded"):
+        print(f"임베딩 처리량: {stats['chunks_per_second']:.1f} chunks/s (체크포인트 복원 {stats['resumed']})")
+
+if __name__ == "__main__":
+    main()
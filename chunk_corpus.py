@@ -0,0 +1,138 @@
+import numpy as np
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+# 청크 폴더(JSON 파일 여러 개)를 파일 하나로 묶은 코퍼스
+# 구조: 헤더 | 고정 길이 레코드 (청크마다 이름/본문 위치와 본문 해시) | 이름 영역 | 본문 영역 (UTF-8)
+# 이름을 한곳에 모아두어 이름표를 만들 때 본문 페이지를 읽지 않도록 함
+MAGIC = b"JJCORP01"
+HEADER = struct.Struct("<8sQQQ")  # magic, 청크 수, 이름 영역 시작 위치, 본문 영역 시작 위치
+RECORD = np.dtype([
+    ("name_offset", "<u8"),
+    ("name_length", "<u4"),
+    ("content_offset", "<u8"),
+    ("content_length", "<u4"),
+    ("hash", "V32"),  # 본문 sha256 (model.content_hash와 같은 값)
+])
+
+# 코퍼스가 청크 폴더보다 최신인지 확인 (파일 추가/삭제는 폴더 수정 시각으로, 내용 변경은 파일 수정 시각으로 판단)
+def corpus_is_current(folder_path, corpus_path):
+    try:
+        built = os.stat(corpus_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    if os.stat(folder_path).st_mtime_ns > built:
+        return False
+    with os.scandir(folder_path) as entries:
+        return all(
+            entry.stat().st_mtime_ns <= built
+            for entry in entries
+            if entry.name.endswith(".json")
+        )
+
+def write_corpus(corpus_path, entries):
+    """Write (name, content) string pairs as a corpus file, one record per pair in order."""
+    names = [name.encode("utf-8") for name, _ in entries]
+    contents = [content.encode("utf-8") for _, content in entries]
+
+    records = np.zeros(len(names), dtype=RECORD)
+    names_start = HEADER.size + records.nbytes
+    position = names_start
+    for i, name in enumerate(names):
+        records[i]["name_offset"] = position
+        records[i]["name_length"] = len(name)
+        position += len(name)
+    contents_start = position
+    for i, content in enumerate(contents):
+        records[i]["content_offset"] = position
+        records[i]["content_length"] = len(content)
+        position += len(content)
+        records[i]["hash"] = hashlib.sha256(content).digest()
+
+    # 임시 파일에 쓴 뒤 교체해서 읽는 쪽이 반쯤 쓰인 파일을 보지 않도록 함
+    os.makedirs(os.path.dirname(corpus_path) or ".", exist_ok=True)
+    tmp_path = f"{corpus_path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(names), names_start, contents_start))
+        file.write(records.tobytes())
+        file.write(b"".join(names))
+        for content in contents:
+            file.write(content)
+    os.replace(tmp_path, corpus_path)
+
+def build_corpus(folder_path, corpus_path):
+    """Pack every chunk JSON file in folder_path into a single corpus file. Returns the chunk count."""
+    entries = []
+    for file_path in sorted(glob.glob(os.path.join(folder_path, "*.json"))):
+        try:
+            with open(file_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except Exception as e:
+            print(f"JSON 파일 로드 중 오류 발생 ({file_path}): {e}")
+            continue
+        if "content" in data:
+            entries.append((os.path.basename(file_path), data["content"]))
+    write_corpus(corpus_path, entries)
+    return len(entries)
+
+# 메모리 맵으로 여는 읽기 전용 코퍼스: 레코드 배열만 바로 사용하고 본문은 필요할 때 디코딩
+class ChunkCorpus:
+    def __init__(self, corpus_path):
+        self.corpus_path = corpus_path
+        with open(corpus_path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, self._names_start, self._contents_start = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"코퍼스 파일 형식이 아닙니다: {corpus_path}")
+        self.records = np.frombuffer(self._mmap, dtype=RECORD, count=count, offset=HEADER.size)
+        self._names = None
+        self._positions = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def _read(self, offset, length):
+        return self._mmap[int(offset):int(offset) + int(length)].decode("utf-8")
+
+    def name(self, position):
+        record = self.records[position]
+        return self._read(record["name_offset"], record["name_length"])
+
+    def content(self, position):
+        record = self.records[position]
+        return self._read(record["content_offset"], record["content_length"])
+
+    def content_hash(self, position):
+        return bytes(self.records[position]["hash"]).hex()
+
+    def names(self):
+        """Return all chunk names in record order."""
+        if self._names is None:
+            # 이름 영역을 한 번에 읽어서 잘라 씀
+            names = self._mmap[self._names_start:self._contents_start]
+            starts = (self.records["name_offset"] - self._names_start).tolist()
+            lengths = self.records["name_length"].tolist()
+            self._names = [names[start:start + length].decode("utf-8") for start, length in zip(starts, lengths)]
+        return self._names
+
+    def position(self, name):
+        """Return the record position of a chunk name, or None. The name table is built on first use."""
+        if self._positions is None:
+            self._positions = {name: i for i, name in enumerate(self.names())}
+        return self._positions.get(name)
+
+    def close(self):
+        self.records = None
+        self._mmap.close()
+
+def open_corpus(folder_path, corpus_path):
+    """Open the corpus for folder_path, repacking it first when the chunk folder changed."""
+    if not corpus_is_current(folder_path, corpus_path):
+        count = build_corpus(folder_path, corpus_path)
+        print(f"청크 코퍼스 생성 완료 ({count}개): {corpus_path}")
+    return ChunkCorpus(corpus_path)
@@ -0,0 +1,214 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+import re
+import time
+
+# 원본 문서로 사용할 파일 확장자 (강의 녹취록 등 텍스트)
+SOURCE_EXTENSIONS = (".txt", ".md")
+# 청크 폴더 안에 기록하는 수집 상태 (원본별 서명과 만들어진 청크 파일 목록)
+# 점으로 시작하고 .json이 아니므로 청크 로드(*.json)에는 포함되지 않음
+STATE_FILE = ".ingest_manifest"
+
+# 문장 경계: 문장부호 뒤 공백, 빈 줄, 슬라이드 구분 표시 (next)
+_BOUNDARY = re.compile(r"(?<=[.?!])\s+|\n\s*\n|\s*(\(next\))\s*")
+_UNSAFE = re.compile(r"[^0-9A-Za-z가-힣_-]+")
+
+def _split_long(sentence, max_chars):
+    """Split a sentence longer than max_chars at whitespace (a single over-long word is cut as is)."""
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        yield sentence[:cut].strip()
+        sentence = sentence[cut:].strip()
+    if sentence:
+        yield sentence
+
+def iter_sentences(blocks, max_chars=1000):
+    """Yield (sentence, new_slide) pairs from an iterable of text blocks without holding the whole text.
+
+    new_slide is True for the first sentence after a (next) marker.
+    """
+    pending = ""
+    new_slide = False
+    for block in blocks:
+        pending += block
+        pieces = _BOUNDARY.split(pending)
+        # 마지막 조각은 다음 블록에서 이어질 수 있으므로 남겨둠
+        pending = pieces.pop()
+        if len(pending) > 4 * max_chars:
+            # 경계 없이 긴 텍스트는 마지막 공백 앞까지만 먼저 처리
+            cut = pending.rfind(" ", 0, len(pending) - max_chars)
+            if cut > 0:
+                pieces.append(pending[:cut])
+                pending = pending[cut:]
+        for piece in pieces:
+            if piece == "(next)":
+                new_slide = True
+                continue
+            for sentence in _split_long(" ".join((piece or "").split()), max_chars):
+                yield sentence, new_slide
+                new_slide = False
+    for sentence in _split_long(" ".join(pending.split()), max_chars):
+        yield sentence, new_slide
+        new_slide = False
+
+def _join(units):
+    text = ""
+    for i, (sentence, new_slide) in enumerate(units):
+        if i:
+            text += " (next) " if new_slide else " "
+        text += sentence
+    return text
+
+# 문장 하나가 청크에서 차지하는 글자 수 (앞의 구분 공백 또는 " (next) " 포함)
+def _cost(sentence, new_slide):
+    return len(sentence) + (8 if new_slide else 1)
+
+def iter_chunks(sentences, max_chars=1000, overlap=150, slide_fill=0.6):
+    """Pack (sentence, new_slide) pairs into chunk texts of at most max_chars, cut only between sentences.
+
+    Once a chunk is slide_fill full it is cut at the next (next) marker. Each chunk starts with the
+    trailing sentences of the previous one, up to overlap characters.
+    """
+    units, length, fresh = [], 0, 0
+    for sentence, new_slide in sentences:
+        added = _cost(sentence, new_slide)
+        if fresh and (length + added > max_chars or (new_slide and length >= slide_fill * max_chars)):
+            yield _join(units)
+            # 앞 청크의 마지막 문장들을 overlap 글자 수 안에서 이어받음
+            carried, carried_length = [], 0
+            for unit in reversed(units):
+                if carried_length + _cost(*unit) > overlap:
+                    break
+                carried.insert(0, unit)
+                carried_length += _cost(*unit)
+            if carried_length + added > max_chars:
+                carried, carried_length = [], 0
+            units, length, fresh = carried, carried_length, 0
+        units.append((sentence, new_slide))
+        length += added
+        fresh += 1
+    if fresh:
+        yield _join(units)
+
+# 청크 파일 이름 형식 버전 (바뀌면 모든 원본을 다시 분할해서 이전 형식의 청크를 정리)
+NAME_FORMAT = 2
+
+# 원본 파일 경로 → 청크 파일 이름 앞부분: 읽기 쉬운 이름(하위 폴더는 __로 연결) + 경로 해시 8자리
+# 읽기 쉬운 이름만으로는 "a b.txt"와 "a_b.txt", "x/y.txt"와 "x__y.txt"가 같아지므로 경로 해시로 구분
+def source_slug(relative_path):
+    path = relative_path.replace(os.sep, "/")
+    stem = _UNSAFE.sub("_", os.path.splitext(path)[0].replace("/", "__"))
+    return f"{stem}-{hashlib.sha256(path.encode('utf-8')).hexdigest()[:8]}"
+
+# 청크 id: 원본 이름 + 본문 해시 (같은 원본에서 내용이 같으면 항상 같은 id)
+def chunk_name(relative_path, content):
+    return f"{source_slug(relative_path)}.{hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]}.json"
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def chunk_source(source_folder, relative_path, chunks_folder, max_chars, overlap):
+    """Stream one source file into chunk JSON files. Returns (relative_path, chunk names). Runs in a worker."""
+    names = []
+    with open(os.path.join(source_folder, relative_path), "r", encoding="utf-8") as file:
+        blocks = iter(lambda: file.read(1 << 16), "")
+        for position, content in enumerate(iter_chunks(iter_sentences(blocks, max_chars), max_chars, overlap)):
+            name = chunk_name(relative_path, content)
+            if name in names:
+                continue  # 같은 원본 안의 완전히 같은 청크
+            names.append(name)
+            path = os.path.join(chunks_folder, name)
+            # 이름이 본문 해시이므로 이미 있는 파일은 내용이 같음 (다시 쓰지 않아 수정 시각도 유지)
+            if not os.path.exists(path):
+                _write_json(path, {"content": content, "source": relative_path, "position": position})
+    return relative_path, names
+
+def _chunk_source_args(args):
+    return chunk_source(*args)
+
+# 원본 폴더의 파일 목록과 (수정 시각, 크기) 서명
+def scan_sources(source_folder):
+    sources = {}
+    for root, _, files in os.walk(source_folder):
+        for file_name in files:
+            if file_name.endswith(SOURCE_EXTENSIONS):
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                sources[os.path.relpath(path, source_folder)] = [stat.st_mtime_ns, stat.st_size]
+    return sources
+
+def load_state(chunks_folder):
+    try:
+        with open(os.path.join(chunks_folder, STATE_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def ingest(source_folder, chunks_folder, max_chars=1000, overlap=150, workers=None):
+    """Chunk new or changed source files into chunks_folder across a process pool.
+
+    Unchanged sources (same mtime and size, same options) are skipped; chunk files of changed or
+    deleted sources that are no longer produced are removed. Chunk files not created by ingest are
+    never touched. Returns stats.
+    """
+    started = time.perf_counter()
+    if not os.path.isdir(source_folder):
+        # 폴더 경로가 잘못되었을 때 기존 청크를 모두 삭제하지 않도록 중단
+        raise FileNotFoundError(f"원본 문서 폴더가 없습니다: {source_folder}")
+    if overlap >= max_chars:
+        raise ValueError(f"overlap({overlap})은 max_chars({max_chars})보다 작아야 합니다")
+    os.makedirs(chunks_folder, exist_ok=True)
+    options = {"max_chars": max_chars, "overlap": overlap, "name_format": NAME_FORMAT}
+    state = load_state(chunks_folder)
+    previous = state.get("sources", {}) if state.get("options") == options else {}
+    old_sources = state.get("sources", {})
+
+    sources = scan_sources(source_folder)
+    changed = sorted(path for path, signature in sources.items() if previous.get(path, {}).get("signature") != signature)
+    results = {path: previous[path] for path in sources if path not in changed}
+
+    # 원본 단위로 프로세스 풀에 나눠서 청크 생성 (한 번에 여러 개씩 넘겨 전달 비용을 줄임)
+    workers = workers or os.cpu_count() or 1
+    tasks = [(source_folder, path, chunks_folder, max_chars, overlap) for path in changed]
+    if workers == 1 or len(tasks) <= 1:
+        outputs = map(_chunk_source_args, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        outputs = executor.map(_chunk_source_args, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+    try:
+        for relative_path, names in outputs:
+            results[relative_path] = {"signature": sources[relative_path], "chunks": names}
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # 더 이상 만들어지지 않는 청크 파일 삭제 (이전 상태에 기록된 파일만)
+    current = {name for entry in results.values() for name in entry["chunks"]}
+    stale = {name for entry in old_sources.values() for name in entry["chunks"]} - current
+    for name in stale:
+        try:
+            os.remove(os.path.join(chunks_folder, name))
+        except FileNotFoundError:
+            pass
+
+    # 변경이 없으면 상태 파일도 다시 쓰지 않음 (청크 폴더 수정 시각이 바뀌면 코퍼스를 다시 묶으므로)
+    new_state = {"options": options, "sources": results}
+    if new_state != state:
+        _write_json(os.path.join(chunks_folder, STATE_FILE), new_state)
+    return {
+        "sources": len(sources),
+        "chunked": len(changed),
+        "unchanged": len(sources) - len(changed),
+        "removed_sources": len(set(old_sources) - set(sources)),
+        "chunks": len(current),
+        "deleted_chunks": len(stale),
+        "seconds": time.perf_counter() - started,
+    }
@@ -0,0 +1,70 @@
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+import httpx
+
+# API 키별 LLM / 임베딩 클라이언트를 재사용하는 풀
+# 요청마다 클라이언트를 새로 만들면 클라이언트 생성과 TLS 연결 비용이 매번 발생하므로,
+# (키 해시, 클라이언트 종류)별로 만든 클라이언트를 LRU로 보관하고 오래 쓰지 않은 것은 제거
+# HTTP 연결은 키와 무관하므로 (인증은 요청 헤더) 모든 클라이언트가 keep-alive 연결 풀 하나를 공유
+class ClientPool:
+    def __init__(self, max_entries=64, idle_timeout=600, max_connections=100, keepalive_expiry=60):
+        self.max_entries = max_entries
+        self.idle_timeout = idle_timeout
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        timeout = httpx.Timeout(600, connect=10)
+        self.http_client = httpx.Client(limits=limits, timeout=timeout)
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        # (키 해시, 이름) → (클라이언트, 마지막 사용 시각)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_hash(api_key):
+        """Pool entries are keyed by a hash so API keys are not kept as dict keys."""
+        return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+
+    def get(self, api_key, name, factory):
+        """Return the pooled client for (api_key, name), creating it with factory(http_client, http_async_client)."""
+        key = (self.key_hash(api_key), name)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], now)
+                self._entries.move_to_end(key)
+                return entry[0]
+        # 생성은 잠금 밖에서 (동시에 만들어졌으면 먼저 등록된 것을 사용)
+        client = factory(self.http_client, self.http_async_client)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            self._entries[key] = (client, now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return client
+
+    # 마지막 사용 후 idle_timeout이 지난 클라이언트 제거 (가장 오래된 것부터 확인)
+    def _expire(self, now):
+        while self._entries:
+            key, (_, last_used) = next(iter(self._entries.items()))
+            if now - last_used < self.idle_timeout:
+                break
+            del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def aclose(self):
+        """Drop every pooled client and close the shared connections."""
+        with self._lock:
+            self._entries.clear()
+        self.http_client.close()
+        await self.http_async_client.aclose()
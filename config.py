@@ -0,0 +1,98 @@
+import os
+
+# 환경 변수로 조정할 수 있는 서버 설정값
+
+# FAISS 벡터스토어와 전처리된 문서 위치
+INDEX_PATH = os.getenv("INDEX_PATH", "./data/vectorstore/faiss_index")
+CHUNKS_FOLDER = os.getenv("CHUNKS_FOLDER", "./data/chunks/")
+# 인덱스 로드 방식: mmap (FAISS 파일과 문서 저장소를 메모리 맵으로 열어 워커 간 공유), pickle (프로세스마다 전체 로드)
+INDEX_STORAGE = os.getenv("INDEX_STORAGE", "mmap")
+# 벡터 인덱스 종류: flat (정확 검색), hnsw, ivf_flat, ivf_pq (PQ 코드로 압축 저장)
+# 벡터 저장 형식: float32, float16, int8 (ivf_pq에는 적용되지 않음), 바꾸면 다음 빌드에서 인덱스 전체를 다시 학습
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_VECTOR_DTYPE = os.getenv("INDEX_VECTOR_DTYPE", "float32")
+# 인덱스 구조 (0이면 벡터 수와 차원으로 자동 결정): IVF 클러스터 수, PQ 부분 공간 수, HNSW 노드당 이웃 수
+INDEX_NLIST = int(os.getenv("INDEX_NLIST", "0"))
+INDEX_PQ_M = int(os.getenv("INDEX_PQ_M", "0"))
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", "32"))
+# 검색 시 정확도/속도 조정: IVF에서 살펴볼 클러스터 수, HNSW 탐색 후보 수
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "64"))
+# 원본 문서(강의 녹취록 등 .txt / .md) 폴더와 청크 분할 설정: 청크 최대 글자 수, 앞 청크에서 이어받을 글자 수,
+# 분할에 사용할 프로세스 수 (0이면 CPU 코어 수)
+RAW_FOLDER = os.getenv("RAW_FOLDER", "./data/raw/")
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))
+# 청크 폴더를 파일 하나로 묶은 코퍼스 (폴더가 바뀌면 인덱스 빌드 시 다시 생성)
+CORPUS_PATH = os.getenv("CORPUS_PATH", "./data/vectorstore/chunks.corpus")
+
+# OpenAI 호환 API 주소 (비워두면 OpenAI 기본 주소 사용, 부하 테스트 시 가짜 서버 주소 지정)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# API 키별 LLM / 임베딩 클라이언트 풀: 최대 보관 수, 사용하지 않으면 제거할 시간(초), 공유 연결 풀 크기
+CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "64"))
+CLIENT_IDLE_TIMEOUT = float(os.getenv("CLIENT_IDLE_TIMEOUT", "600"))
+CLIENT_MAX_CONNECTIONS = int(os.getenv("CLIENT_MAX_CONNECTIONS", "100"))
+
+# FAISS 검색을 실행할 스레드 풀 크기
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+
+# /ask/batch: 요청 하나에 보낼 수 있는 최대 질문 수, 요청 하나에서 동시에 실행할 LLM 호출 수 (요청에서 더 낮게 지정 가능)
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "256"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+# 단계별 타임아웃 (초)
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "10"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "5"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# 임베딩 전에 tiktoken으로 입력 길이를 확인할지 여부 (오프라인 부하 테스트에서는 0으로 설정)
+EMBED_TOKENIZE = os.getenv("EMBED_TOKENIZE", "1") == "1"
+
+# 임베딩 백엔드: openai (EMBEDDING_MODEL을 API로 호출), hashed_ngram (문자 n-gram 해시 벡터를 로컬 CPU에서 계산)
+# 백엔드를 바꾸면 인덱스를 다시 빌드해야 함 (다른 백엔드로 만든 인덱스는 로드하지 않음)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+# hashed_ngram 백엔드의 벡터 차원과 사용할 문자 n-gram 길이
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1024"))
+EMBEDDING_NGRAMS = tuple(int(n) for n in os.getenv("EMBEDDING_NGRAMS", "2,3").split(","))
+
+# 임베딩 모델과 디스크 임베딩 캐시 설정
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./data/vectorstore/embedding_cache.sqlite")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "100000"))
+
+# 인덱스 빌드 시 임베딩 배치 크기, 동시에 보낼 배치 수, 429/5xx 재시도 횟수
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+
+# 서버 로그 레벨과, DEBUG 레벨에서 프롬프트 전체를 기록할 요청 비율 (0~1)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+PROMPT_LOG_SAMPLE_RATE = float(os.getenv("PROMPT_LOG_SAMPLE_RATE", "0.01"))
+
+# 답변 캐시: 최대 항목 수, 유효 시간(초), 유사 질문으로 볼 코사인 유사도, 캐시를 사용할 최대 대화 이력 길이
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_MAX_HISTORY = int(os.getenv("ANSWER_CACHE_MAX_HISTORY", "2"))
+
+# 검색 방식: hybrid (BM25 + FAISS), vector (FAISS만), lexical (BM25만, 임베딩 호출 없음)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# 순위 결합 전에 각 검색기에서 가져올 후보 수
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+# 하이브리드 모드에서 이 시간 안에 질의 임베딩이 끝나지 않으면 BM25 결과만 사용 (초)
+LEXICAL_FALLBACK_TIMEOUT = float(os.getenv("LEXICAL_FALLBACK_TIMEOUT", "2"))
+
+# 컨텍스트 구성: 검색해서 넘길 청크 수, 컨텍스트와 시스템 프롬프트의 토큰 예산
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "10"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "500"))
+
+# 세션 대화 상태: 저장 위치, 그대로 넣을 최근 메시지 수, 요약 + 최근 메시지의 토큰 예산,
+# 요약을 갱신할 오래된 메시지 수, 요약에 사용할 모델
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "./data/sessions.sqlite")
+SESSION_RECENT_MESSAGES = int(os.getenv("SESSION_RECENT_MESSAGES", "6"))
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "1500"))
+SESSION_SUMMARY_BATCH = int(os.getenv("SESSION_SUMMARY_BATCH", "4"))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
@@ -0,0 +1,132 @@
+from collections import Counter, defaultdict
+import re
+
+# 토큰 수 계산: tiktoken을 쓸 수 없는 환경(오프라인 등)에서는 UTF-8 바이트 수로 근사
+try:
+    import tiktoken
+    _encoding = tiktoken.encoding_for_model("gpt-4o")
+
+    def count_tokens(text):
+        return len(_encoding.encode(text))
+except Exception:
+    def count_tokens(text):
+        return len(text.encode("utf-8")) // 3 + 1
+
+# 문장 경계: 마침표/물음표/느낌표 뒤의 공백, 또는 슬라이드 구분자 (next)
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.?!])\s+|\s*\(next\)\s*")
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+def _normalize(sentence):
+    return " ".join(sentence.split())
+
+def _shingles(text, n=3):
+    text = "".join(text.split())
+    return {text[i:i + n] for i in range(max(len(text) - n + 1, 1))}
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+# 이미 포함한 문장들: shingle → 문장 번호 역색인으로 shingle을 하나라도 공유하는 문장만 비교
+class _SeenSentences:
+    def __init__(self, near_duplicate):
+        self.near_duplicate = near_duplicate
+        self.exact = set()
+        self.sentences = []  # (정규화된 문장, shingle 수)
+        self.postings = defaultdict(list)
+
+    def is_duplicate(self, normalized, shingles):
+        """Exact repeat, fragment of an included sentence, or trigram Jaccard >= near_duplicate."""
+        if normalized in self.exact:
+            return True
+        if len(next(iter(shingles))) < 3:
+            # shingle 길이보다 짧은 문장("1." 등)은 역색인에 걸리지 않으므로 포함 여부만 직접 확인
+            return any(normalized in other for other, _ in self.sentences)
+        shared = Counter(index for shingle in shingles for index in self.postings.get(shingle, ()))
+        for index, count in shared.items():
+            other, other_size = self.sentences[index]
+            # 다른 문장의 일부라면 shingle이 모두 그 문장에 들어 있음
+            if count == len(shingles) and normalized in other:
+                return True
+            if count / (len(shingles) + other_size - count) >= self.near_duplicate:
+                return True
+        return False
+
+    def add(self, normalized, shingles):
+        self.exact.add(normalized)
+        for shingle in shingles:
+            self.postings[shingle].append(len(self.sentences))
+        self.sentences.append((normalized, len(shingles)))
+
+def truncate_to_tokens(text, budget):
+    """Keep whole lines (leading indentation stripped) until the token budget is used up."""
+    lines = []
+    used = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        tokens = count_tokens(line) + 1
+        if used + tokens > budget:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines)
+
+def pack_context(docs, token_budget=2000, mmr_lambda=0.7, near_duplicate=0.8):
+    """Assemble retrieved chunks into a context string within a token budget.
+
+    docs are in relevance order. Sentences already included (exactly, as a
+    fragment of an included sentence, or with trigram Jaccard >= near_duplicate)
+    are dropped, chunks are taken in MMR order so that overlapping windows of the
+    same transcript do not crowd out other material, and chunks are only ever
+    cut at sentence boundaries. Returns (context, stats).
+    """
+    candidates = []
+    for rank, doc in enumerate(docs):
+        sentences = split_sentences(doc.page_content)
+        candidates.append({
+            "rank": rank,
+            "sentences": sentences,
+            "shingles": _shingles(" ".join(sentences)),
+            "redundancy": 0.0,  # 이미 고른 청크와의 최대 Jaccard
+        })
+
+    seen = _SeenSentences(near_duplicate)
+    passages = []
+    used = 0
+    dropped = 0
+
+    while candidates and used < token_budget:
+        # MMR: 관련도(검색 순위)는 높고 이미 고른 청크와는 덜 겹치는 청크부터 선택
+        def mmr_score(candidate):
+            relevance = 1.0 / (candidate["rank"] + 1)
+            return mmr_lambda * relevance - (1 - mmr_lambda) * candidate["redundancy"]
+
+        candidate = max(candidates, key=mmr_score)
+        candidates.remove(candidate)
+        # 남은 후보의 겹침은 새로 고른 청크와만 비교해서 갱신
+        for other in candidates:
+            other["redundancy"] = max(other["redundancy"], _jaccard(other["shingles"], candidate["shingles"]))
+
+        kept = []
+        for sentence in candidate["sentences"]:
+            normalized = _normalize(sentence)
+            shingles = _shingles(normalized)
+            if seen.is_duplicate(normalized, shingles):
+                dropped += 1
+                continue
+            tokens = count_tokens(sentence) + 1
+            if used + tokens > token_budget:
+                break
+            kept.append(sentence)
+            seen.add(normalized, shingles)
+            used += tokens
+        if kept:
+            passages.append(" ".join(kept))
+
+    stats = {"tokens": used, "passages": len(passages), "dropped_sentences": dropped}
+    return "\n\n".join(passages), stats
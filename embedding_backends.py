@@ -0,0 +1,73 @@
+from langchain_core.embeddings import Embeddings
+import numpy as np
+
+# 선택할 수 있는 임베딩 백엔드: openai (API 호출, 디스크 캐시 사용), hashed_ngram (로컬 CPU 계산)
+EMBEDDING_BACKENDS = ("openai", "hashed_ngram")
+
+# 문자 n-gram 해시 계산용 상수 (64비트 곱셈은 자리 넘침을 그대로 버림)
+_PRIME = np.uint64(1099511628211)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+# 여러 텍스트를 한 번에 처리할 때 텍스트 사이에 넣는 구분 문자 (이 문자를 포함한 n-gram은 버림)
+_SEPARATOR = "\x00"
+
+# 문자 n-gram을 해시해서 고정 차원 벡터로 투영하는 로컬 임베딩 (네트워크 호출 없음)
+# 한국어는 음절 2~3-gram만으로도 어휘가 잘 구분되고, 띄어쓰기를 포함한 n-gram이 단어 경계를 반영
+# 각 n-gram은 해시로 정한 차원에 +1/-1로 더하고 (signed feature hashing), 빈도는 log로 줄인 뒤 길이 1로 정규화
+# 코퍼스 통계(IDF)는 쓰지 않아 같은 텍스트는 항상 같은 벡터 (문서 빈도 가중치는 하이브리드 검색의 BM25가 담당)
+class HashedNgramEmbeddings(Embeddings):
+    def __init__(self, dim=1024, ngrams=(2, 3)):
+        self.dim = dim
+        self.ngrams = tuple(sorted(ngrams))
+
+    @property
+    def model(self):
+        """Identifier recorded in the index manifest; changes whenever the produced vectors would change."""
+        return f"hashed-ngram-v1-n{','.join(map(str, self.ngrams))}-d{self.dim}"
+
+    @staticmethod
+    def _normalize(text):
+        return " " + " ".join(text.lower().split()) + " "
+
+    def embed_array(self, texts):
+        """Embed texts as an (n, dim) float32 array in one vectorized pass."""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        normalized = [self._normalize(text) for text in texts]
+        joined = _SEPARATOR.join(normalized)
+        codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        # 각 문자 위치가 속한 텍스트 번호와, 위치까지의 구분 문자 개수 (n-gram 안에 구분 문자가 있는지 확인용)
+        rows = np.repeat(np.arange(len(texts)), [len(text) + 1 for text in normalized])[:len(codes)]
+        separators = np.concatenate(([0], np.cumsum(codes == ord(_SEPARATOR))))
+
+        buckets, signs = [], []
+        for n in self.ngrams:
+            count = len(codes) - n + 1
+            if count <= 0:
+                continue
+            hashed = np.full(count, n, dtype=np.uint64)
+            for offset in range(n):
+                hashed = hashed * _PRIME + codes[offset:offset + count]
+            hashed *= _MIX
+            valid = separators[n:n + count] == separators[:count]
+            hashed = hashed[valid]
+            buckets.append(rows[:count][valid] * self.dim + ((hashed >> np.uint64(32)) % np.uint64(self.dim)).astype(np.int64))
+            signs.append(np.where(hashed & np.uint64(1 << 31), 1.0, -1.0))
+        counts = np.bincount(
+            np.concatenate(buckets), weights=np.concatenate(signs), minlength=len(texts) * self.dim
+        ).reshape(len(texts), self.dim)
+        vectors = np.sign(counts) * np.log1p(np.abs(counts))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_array([text])[0].tolist()
+
+    # 1ms 미만의 CPU 계산이므로 스레드로 넘기지 않고 바로 계산
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
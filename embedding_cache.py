@@ -0,0 +1,167 @@
+from langchain_core.embeddings import Embeddings
+import numpy as np
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# 최대 개수를 넘으면 이 비율까지 줄여서 바로 다음 저장에서 다시 삭제하지 않도록 함
+EVICT_TO = 0.9
+
+# (임베딩 모델, 텍스트 해시) → float32 벡터를 저장하는 SQLite 기반 임베딩 캐시
+class EmbeddingCache:
+    def __init__(self, db_path, max_entries=100000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        # 행 수 추정값: 처음 한 번만 COUNT(*)로 세고 이후에는 저장한 행 수만 더함
+        # (교체된 행과 다른 프로세스가 지운 행도 세므로 실제보다 크거나 같음, 넘으면 실제 개수를 다시 셈)
+        self._estimated_rows = None
+        self._count_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.init_database()
+
+    # 스레드마다 연결을 하나씩 유지
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def init_database(self):
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)')
+        conn.commit()
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get_many(self, model, texts):
+        """Return a list with the cached vector (list of floats) or None for each text."""
+        hashes = [self.text_hash(text) for text in texts]
+        conn = self._connection()
+        found = {}
+        # SQLite 변수 개수 제한을 넘지 않도록 나눠서 조회
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f'SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})',
+                (model, *batch),
+            ).fetchall()
+            found.update(rows)
+        if found:
+            # 최근 사용 시각 갱신 (LRU)
+            now = time.time_ns()
+            conn.executemany(
+                'UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?',
+                [(now, model, h) for h in found],
+            )
+            conn.commit()
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return [
+            np.frombuffer(found[h], dtype=np.float32).tolist() if h in found else None
+            for h in hashes
+        ]
+
+    def put_many(self, model, texts, vectors):
+        now = time.time_ns()
+        conn = self._connection()
+        conn.executemany(
+            'INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)',
+            [
+                (model, self.text_hash(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for text, vector in zip(texts, vectors)
+            ],
+        )
+        conn.commit()
+        with self._count_lock:
+            if self._estimated_rows is None:
+                self._estimated_rows = self._count_rows(conn)
+            else:
+                self._estimated_rows += len(texts)
+            over = self._estimated_rows > self.max_entries
+        if over:
+            self.evict()
+
+    def _count_rows(self, conn):
+        return conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    # 최대 개수를 넘으면 가장 오래 사용되지 않은 항목부터 EVICT_TO 비율까지 삭제
+    def evict(self):
+        conn = self._connection()
+        count = self._count_rows(conn)
+        if count > self.max_entries:
+            target = int(self.max_entries * EVICT_TO)
+            conn.execute(
+                'DELETE FROM embeddings WHERE (model, text_hash) IN '
+                '(SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?)',
+                (count - target,),
+            )
+            conn.commit()
+            count = target
+        with self._count_lock:
+            self._estimated_rows = count
+
+# 캐시를 먼저 확인하고 없는 텍스트만 실제 임베딩 모델로 계산하는 래퍼
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings, model, cache):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts):
+        vectors = self.cache.get_many(self.model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            self._fill(texts, vectors, missing, computed)
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    # 질의 경로에서 호출되므로 SQLite 조회 / 기록은 스레드에서 실행 (busy timeout 동안 이벤트 루프를 막지 않도록)
+    async def aembed_documents(self, texts):
+        vectors = await asyncio.to_thread(self.cache.get_many, self.model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            await asyncio.to_thread(self._fill, texts, vectors, missing, computed)
+        return vectors
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+    def _fill(self, texts, vectors, missing, computed):
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+        self.cache.put_many(self.model, [texts[i] for i in missing], computed)
+
+# 프로세스 안에서 같은 캐시 파일은 한 번만 열기
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(db_path, max_entries=100000):
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = EmbeddingCache(db_path, max_entries=max_entries)
+        return _caches[db_path]
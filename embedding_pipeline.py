@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from openai import APIConnectionError, APIStatusError, APITimeoutError
+from embedding_cache import CachedEmbeddings
+import random
+import time
+
+# 재시도할 오류인지 확인 (429, 5xx, 네트워크 오류)
+def is_retryable(error):
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+# 재시도 대기 시간: Retry-After 헤더가 있으면 따르고, 없으면 지수 백오프 + 지터
+def backoff_delay(error, attempt, base_delay=1.0, max_delay=60.0):
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), max_delay)
+        except ValueError:
+            pass
+    return min(base_delay * (2 ** attempt), max_delay) * random.uniform(0.5, 1.0)
+
+# 배치 하나를 임베딩 (재시도 포함)
+def embed_batch(embeddings, texts, max_retries=6, base_delay=1.0):
+    attempt = 0
+    while True:
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(e, attempt, base_delay)
+            print(f"임베딩 요청 실패, {delay:.1f}초 후 재시도 ({attempt + 1}/{max_retries}): {e}")
+            time.sleep(delay)
+            attempt += 1
+
+def embed_texts(embeddings, texts, batch_size=64, max_in_flight=4, max_retries=6, progress=print):
+    """Embed texts in batches with a bounded number of batches in flight.
+
+    When embeddings is a CachedEmbeddings, its cache is used as the checkpoint:
+    vectors are looked up before any batch is sent and every finished batch is
+    stored right away, so an interrupted build resumes with the remaining texts.
+    Returns (vectors, stats).
+    """
+    started = time.perf_counter()
+    vectors = [None] * len(texts)
+
+    checkpoint = None
+    if isinstance(embeddings, CachedEmbeddings):
+        checkpoint = embeddings
+        vectors = checkpoint.cache.get_many(checkpoint.model, texts)
+        embeddings = checkpoint.embeddings
+    pending = [i for i, vector in enumerate(vectors) if vector is None]
+    resumed = len(texts) - len(pending)
+    if resumed and progress:
+        progress(f"체크포인트에서 {resumed}개 청크 복원")
+
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+    done = 0
+
+    def run(batch):
+        batch_texts = [texts[i] for i in batch]
+        batch_vectors = embed_batch(embeddings, batch_texts, max_retries=max_retries)
+        if checkpoint is not None:
+            checkpoint.cache.put_many(checkpoint.model, batch_texts, batch_vectors)
+        return batch, batch_vectors
+
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embed") as executor:
+        remaining = iter(batches)
+        in_flight = set()
+        while True:
+            # 동시에 진행 중인 배치 수를 max_in_flight 이하로 유지
+            while len(in_flight) < max_in_flight:
+                batch = next(remaining, None)
+                if batch is None:
+                    break
+                in_flight.add(executor.submit(run, batch))
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch, batch_vectors = future.result()
+                for i, vector in zip(batch, batch_vectors):
+                    vectors[i] = vector
+                done += len(batch)
+                if progress:
+                    elapsed = time.perf_counter() - started
+                    progress(f"임베딩 {done}/{len(pending)} 청크 ({done / elapsed:.1f} chunks/s)")
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "embedded": done,
+        "resumed": resumed,
+        "embed_seconds": elapsed,
+        "chunks_per_second": done / elapsed if elapsed > 0 else 0.0,
+    }
+    return vectors, stats
@@ -1,12 +1,57 @@
-from stream import show_intro, ChatHistoryManager
-from datetime import datetime
+from stream import show_intro, show_history_page, show_search_results, ChatHistoryManager
+from utils import ThrottledMarkdown
+from requests.adapters import HTTPAdapter
 import streamlit as st
 import requests
+import json
+import os
+import time
 import uuid
-import re
 
-# FastAPI 서버 URL
-API_URL = "http://127.0.0.1:8000/ask"
+# FastAPI 서버 URL (run.py가 서버 주소를 API_BASE로 전달)
+API_BASE = os.getenv("API_BASE", "http://127.0.0.1:8000")
+API_URL = f"{API_BASE}/ask"
+STREAM_URL = f"{API_URL}/stream"
+
+# API 서버와의 연결을 재사용하는 HTTP 세션 (재실행마다 새로 만들지 않고 프로세스에서 하나만 사용)
+@st.cache_resource
+def get_http_session():
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=32))
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=32))
+    return session
+
+# 스트리밍 엔드포인트로 질문을 보내고 도착하는 토큰을 일정 간격으로 모아서 화면에 표시
+def stream_answer(payload):
+    placeholder = st.empty()
+    placeholder.markdown("▌")
+    renderer = ThrottledMarkdown(placeholder)
+    ttft_ms = None
+    started = time.perf_counter()
+    with get_http_session().post(STREAM_URL, json=payload, stream=True) as response:
+        if response.status_code != 200:
+            placeholder.empty()
+            st.error("Failed to get a response from the server.")
+            return None
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["type"] == "token":
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - started) * 1000
+                renderer.append(event["content"])
+            elif event["type"] == "done":
+                renderer.text = event["answer"]
+            elif event["type"] == "error":
+                placeholder.empty()
+                st.error(f"응답 생성 중 오류 발생: {event['detail']}")
+                return None
+    renderer.finish()
+    # 첫 토큰까지 걸린 시간 (TTFT)을 별도 지표로 표시
+    if ttft_ms is not None:
+        st.caption(f"첫 토큰까지 {ttft_ms:.0f} ms")
+    return renderer.text
 
 # 페이지 설정
 st.set_page_config(page_title="제주도 창업 계획", page_icon="🏝️")
@@ -21,8 +66,12 @@ if 'session_id' not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
 session_id = st.session_state.session_id
 
-# 히스토리 관리자 초기화
-history_manager = ChatHistoryManager()
+# 히스토리 관리자 초기화 (재실행마다 새로 만들지 않고 프로세스에서 하나만 사용)
+@st.cache_resource
+def get_history_manager():
+    return ChatHistoryManager()
+
+history_manager = get_history_manager()
 
 # OpenAI API 키 입력 섹션 
 st.sidebar.header("🔑 OpenAI API Key")
@@ -63,21 +112,22 @@ if menu == "채팅":
                 st.session_state.messages.append({"role": "user", "content": question})
                 with st.chat_message("user"):
                     st.markdown(question)
-                history_manager.add_message("user", question, session_id)
 
-                # AI 응답 생성
+                # AI 응답 생성 (스트리밍이 끝난 뒤 히스토리에 저장)
                 with st.chat_message("assistant"):
-                    with st.spinner("Waiting for a response..."):
-                        # FastAPI 서버로 POST 요청
-                        response = requests.post(API_URL, json={"api_key": api_key, "question": question})
-                        
-                        if response.status_code == 200:
-                            answer = response.json().get("answer", "No answer received.")
-                            st.markdown(answer)
-                            st.session_state.messages.append({"role": "assistant", "content": answer})
-                            history_manager.add_message("assistant", answer, session_id)
-                        else:
-                            st.error("Failed to get a response from the server.")
+                    # 빠른 질문은 이전 대화 없이 답변 (서버 답변 캐시 재사용), 대화 기록에는 남김
+                    answer = stream_answer({
+                        "api_key": api_key,
+                        "question": question,
+                        "session_id": session_id,
+                        "include_history": False,
+                    })
+                    if answer is not None:
+                        st.session_state.messages.append({"role": "assistant", "content": answer})
+                        # 질문과 답변을 하나의 트랜잭션으로 저장
+                        history_manager.add_turn(question, answer, session_id)
+                    else:
+                        history_manager.add_message("user", question, session_id)
 
         # 채팅 입력란
         if question := st.chat_input("창업 아이디어 또는 질문을 입력하세요"):
@@ -85,32 +135,22 @@ if menu == "채팅":
             st.session_state.messages.append({"role": "user", "content": question})
             with st.chat_message("user"):
                 st.markdown(question)
-            history_manager.add_message("user", question, session_id)
-
-            # 기존 대화 이력 가져오기 (최대 20개의 메시지로 제한)
-            conversation_history = history_manager.get_messages(session_id, limit=20)
-            # 시간 순서대로 정렬
-            conversation_history = conversation_history[::-1]
-            
-            # AI 응답 생성
+
+            # AI 응답 생성 (스트리밍이 끝난 뒤 히스토리에 저장)
             with st.chat_message("assistant"):
-                with st.spinner("Waiting for a response..."):
-                    # 대화 이력을 서버로 전송
-                    data = {
-                        "api_key": api_key,
-                        "conversation": [{"role": role, "content": content} for role, content, _ in conversation_history],
-                        "question": question
-                    }
-                    # FastAPI 서버로 POST 요청
-                    response = requests.post(API_URL, json=data)
-                    
-                    if response.status_code == 200:
-                        answer = response.json().get("answer", "No answer received.")
-                        st.markdown(answer)
-                        st.session_state.messages.append({"role": "assistant", "content": answer})
-                        history_manager.add_message("assistant", answer, session_id)
-                    else:
-                        st.error("Failed to get a response from the server.")
+                # 대화 이력은 서버가 session_id로 관리하므로 새 질문만 전송
+                data = {
+                    "api_key": api_key,
+                    "question": question,
+                    "session_id": session_id,
+                }
+                answer = stream_answer(data)
+                if answer is not None:
+                    st.session_state.messages.append({"role": "assistant", "content": answer})
+                    # 질문과 답변을 하나의 트랜잭션으로 저장
+                    history_manager.add_turn(question, answer, session_id)
+                else:
+                    history_manager.add_message("user", question, session_id)
 
     else:
         st.warning("OpenAI API 키를 입력해주세요.")
@@ -118,22 +158,14 @@ if menu == "채팅":
 elif menu == "채팅 히스토리":
     # 저장된 채팅 히스토리 표시 
     st.header("📜 채팅 히스토리")
-    messages = history_manager.get_messages(session_id, limit=100)
-    
-    for msg in messages:
-        role, content, timestamp = msg
-        formatted_timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M")
-        
-        if role == "user":
-            st.markdown(f"**👤 사용자 [{formatted_timestamp}]:**\n{content}")
-        else:
-            st.markdown(f"**🤖 AI [{formatted_timestamp}]:**\n{content}")
-        
-        st.divider()
-    
+    show_history_page(history_manager, session_id)
+
     # 히스토리 삭제 버튼
     if st.button("전체 히스토리 삭제"):
         history_manager.clear_history(session_id)
+        st.session_state.history_cursors = [None]
+        # 서버에 저장된 대화 상태도 함께 삭제
+        get_http_session().delete(f"{API_BASE}/session/{session_id}")
         st.success("채팅 히스토리가 삭제되었습니다.")
 
 elif menu == "히스토리 검색":
@@ -143,27 +175,4 @@ elif menu == "히스토리 검색":
     
     if search_query:
         # 검색 결과 표시
-        results = history_manager.search_messages(search_query, session_id)
-        st.subheader(f"'{search_query}' 검색 결과")
-        
-        if results:
-            for msg in results:
-                role, content, timestamp = msg
-                formatted_timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M")
-                
-                # 검색어 하이라이트
-                highlighted_content = re.sub(
-                    f'({re.escape(search_query)})', 
-                    r'**\1**', 
-                    content, 
-                    flags=re.IGNORECASE
-                )
-                
-                if role == "user":
-                    st.markdown(f"**👤 사용자 [{formatted_timestamp}]:**\n{highlighted_content}")
-                else:
-                    st.markdown(f"**🤖 AI [{formatted_timestamp}]:**\n{highlighted_content}")
-                
-                st.divider()
-        else:
-            st.info("검색 결과가 없습니다.")
\ No newline at end of file
+        show_search_results(history_manager, search_query, session_id)
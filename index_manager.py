@@ -0,0 +1,158 @@
+from model import load_vector_store, check_index_embedding, index_file_signature
+from lexical_index import LexicalIndex, lexical_index_path
+from mmap_docstore import docstore_path
+from retrieval import hybrid_search
+import numpy as np
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+# 로드 중에 인덱스 파일이 바뀌었을 때 다시 읽는 최대 횟수
+LOAD_ATTEMPTS = 3
+
+# 프로세스 단위로 FAISS 벡터스토어를 한 번만 로드하고, 인덱스 파일이 바뀌면 교체하는 관리자
+class VectorStoreManager:
+    def __init__(self, index_path, poll_interval=2.0, mmap=False, embedding=None, embedding_dim=None):
+        self.index_path = index_path
+        # 질의에 사용할 임베딩 (백엔드, 모델)과 벡터 차원: 다른 임베딩으로 만든 인덱스는 로드하지 않음
+        self.embedding = embedding
+        self.embedding_dim = embedding_dim
+        # 마지막 로드 실패 이유 (/ready에 표시)
+        self.load_error = None
+        self.poll_interval = poll_interval
+        # True면 인덱스와 문서를 메모리 맵으로 열어 같은 호스트의 워커들이 페이지 캐시를 공유
+        self.mmap = mmap
+        self._lock = threading.Lock()
+        # (vectorstore, version, BM25 색인) 튜플을 한 번에 교체해서 요청 중인 쪽은 이전 스냅샷을 그대로 사용
+        self._current = (None, None, None)
+        self._signature = None
+        self._pending_signature = None
+        self._warm_version = None
+
+    # 인덱스 파일의 [수정 시각, 크기] 서명 (build_index와 같은 함수)
+    # 문서 저장소와 BM25 색인도 FAISS 파일과 따로 교체되므로 함께 감시 (하나만 바뀌어도 다시 로드)
+    def _file_signature(self):
+        return index_file_signature(self.index_path, companions=True)
+
+    # 버전 id: 파일 서명을 repr로 직렬화한 sha256의 앞 12자리
+    # 파일 내용을 읽지 않으므로 mmap 로드에서도 페이지를 건드리지 않고, 같은 파일을 연 워커들은 같은 버전을 얻음
+    # 인덱스는 항상 새 파일로 교체해서 저장하므로 내용이 바뀌면 서명도 바뀜
+    @staticmethod
+    def _compute_version(signature):
+        return hashlib.sha256(repr(signature).encode("utf-8")).hexdigest()[:12]
+
+    def get(self):
+        """Return the current (vectorstore, version) snapshot."""
+        return self._current[:2]
+
+    def snapshot(self):
+        """Return the current (vectorstore, version, lexical index) snapshot."""
+        return self._current
+
+    # BM25 색인 로드 (없으면 None → 벡터 검색만 사용)
+    def _load_lexical(self):
+        path = lexical_index_path(self.index_path)
+        if not os.path.exists(path):
+            return None
+        return LexicalIndex.load(path)
+
+    @property
+    def version(self):
+        return self._current[1]
+
+    def is_loaded(self):
+        return self._current[0] is not None
+
+    def is_ready(self):
+        """True once a store is loaded and has answered a warm-up search."""
+        return self.is_loaded() and self._current[1] == self._warm_version
+
+    # 교체 전에 검색을 한 번 실행해서 인덱스 페이지와 BM25 색인을 미리 올려둠 (첫 요청이 느려지지 않도록)
+    def _warm(self, vectorstore, lexical):
+        query_vector = np.zeros(vectorstore.index.d, dtype=np.float32)
+        hybrid_search(vectorstore, lexical, "제주 창업 지원", query_vector, k=1)
+
+    def load(self):
+        """Load the index from disk if present. Returns True when a store was swapped in."""
+        with self._lock:
+            # 빌드가 파일을 하나씩 교체하는 도중에 읽으면 새 문서 저장소와 이전 FAISS 파일처럼 짝이 맞지 않을 수 있으므로
+            # 로드 전후 서명이 같을 때만 사용 (다르면 잠시 뒤 다시 시도)
+            for attempt in range(LOAD_ATTEMPTS):
+                signature = self._file_signature()
+                if signature is None:
+                    return False
+                vectorstore, lexical = self._load_files()
+                if self._file_signature() == signature:
+                    break
+                time.sleep(0.2 * (attempt + 1))
+            else:
+                self.load_error = "인덱스 파일이 로드 중에 계속 바뀌었습니다"
+                raise RuntimeError(self.load_error)
+            if self.embedding is not None:
+                try:
+                    check_index_embedding(self.index_path, self.embedding, vectorstore.index.d, self.embedding_dim)
+                except ValueError as e:
+                    # 다른 임베딩으로 만든 인덱스: 파일이 다시 바뀔 때까지 재시도하지 않음
+                    self.load_error = str(e)
+                    self._signature = signature
+                    raise
+            version = self._compute_version(signature)
+            self._warm(vectorstore, lexical)
+            self._current = (vectorstore, version, lexical)
+            self._warm_version = version
+            self._signature = signature
+            self._pending_signature = None
+            self.load_error = None
+            print(f"FAISS 인덱스 로드 완료 (version={version})")
+            return True
+
+    # 벡터스토어와 BM25 색인을 파일에서 읽음 (문서 저장소가 없는 이전 인덱스는 pickle로 로드)
+    def _load_files(self):
+        mmap = self.mmap and os.path.exists(docstore_path(self.index_path))
+        try:
+            return load_vector_store(self.index_path, mmap=mmap), self._load_lexical()
+        except Exception as e:
+            self.load_error = str(e)
+            raise
+
+    def publish(self, vectorstore):
+        """Swap in a store that was just built and saved in this process."""
+        if self.mmap:
+            # 다른 워커와 같은 파일을 공유하도록 저장된 파일을 다시 열어서 사용
+            self.load()
+            return
+        with self._lock:
+            signature = self._file_signature()
+            version = self._compute_version(signature)
+            lexical = self._load_lexical()
+            self._warm(vectorstore, lexical)
+            self._current = (vectorstore, version, lexical)
+            self._warm_version = version
+            self._signature = signature
+            self._pending_signature = None
+            self.load_error = None
+
+    def refresh_if_changed(self):
+        """Reload when the index files changed and stayed stable for one poll interval."""
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            self._pending_signature = None
+            return False
+        # 파일을 쓰는 도중일 수 있으므로 같은 서명이 두 번 연속 관찰될 때만 교체
+        if signature != self._pending_signature:
+            self._pending_signature = signature
+            return False
+        try:
+            return self.load()
+        except Exception as e:
+            print(f"FAISS 인덱스 재로드 중 오류 발생 (기존 인덱스 유지): {e}")
+            self._pending_signature = None
+            return False
+
+    async def watch(self):
+        """Poll the index files and hot-swap the store when they change."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await asyncio.to_thread(self.refresh_if_changed)
@@ -0,0 +1,33 @@
+"""Split raw source documents (data/raw) into chunk JSON files (data/chunks) for build_index.py.
+
+Usage: python ingest.py [--raw ./data/raw/] [--chunks ./data/chunks/] [--max-chars 1000] [--overlap 150]
+Sources are .txt / .md files (subfolders included). Only new or changed sources are re-chunked.
+"""
+from chunker import ingest
+from config import RAW_FOLDER, CHUNKS_FOLDER, CHUNK_MAX_CHARS, CHUNK_OVERLAP, INGEST_WORKERS
+import argparse
+import sys
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--raw", default=RAW_FOLDER, help="원본 문서 폴더")
+    parser.add_argument("--chunks", default=CHUNKS_FOLDER, help="청크 JSON을 기록할 폴더")
+    parser.add_argument("--max-chars", type=int, default=CHUNK_MAX_CHARS, help="청크 최대 글자 수")
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP, help="앞 청크에서 이어받을 최대 글자 수")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="프로세스 수 (0이면 CPU 코어 수)")
+    args = parser.parse_args()
+
+    try:
+        stats = ingest(args.raw, args.chunks, args.max_chars, args.overlap, workers=args.workers or None)
+    except (OSError, ValueError) as e:
+        print(f"청크 분할 중 오류 발생: {e}")
+        return 1
+    print(
+        f"원본 {stats['sources']}개 (분할 {stats['chunked']}, 유지 {stats['unchanged']}, "
+        f"삭제 {stats['removed_sources']}) → 청크 {stats['chunks']}개, 삭제한 청크 {stats['deleted_chunks']}개 "
+        f"({stats['seconds']:.2f} s)"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
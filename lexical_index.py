@@ -0,0 +1,98 @@
+from collections import Counter, defaultdict
+import heapq
+import json
+import math
+import os
+import re
+
+# 한글/영문/숫자 단어 단위로 나눈 뒤 글자 n-gram 생성 (형태소 분석기 없이 한국어 부분 일치 지원)
+_WORD = re.compile(r"[0-9a-zA-Z가-힣]+")
+
+def tokenize(text, n=2):
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        if len(word) <= n:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + n] for i in range(len(word) - n + 1))
+    return tokens
+
+# 청크 문서에 대한 BM25 역색인
+class LexicalIndex:
+    def __init__(self, doc_ids, doc_lengths, postings, k1=1.5, b=0.75):
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        # term → [(문서 번호, 단어 빈도), ...]
+        self.postings = postings
+        self.k1 = k1
+        self.b = b
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        total = len(doc_ids)
+        self.idf = {
+            term: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, documents):
+        """Build from an iterable of (doc_id, text) pairs."""
+        doc_ids, doc_lengths = [], []
+        postings = defaultdict(list)
+        for doc_index, (doc_id, text) in enumerate(documents):
+            counts = Counter(tokenize(text))
+            doc_ids.append(doc_id)
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append((doc_index, tf))
+        return cls(doc_ids, doc_lengths, dict(postings))
+
+    def search(self, query, k=20):
+        """Return up to k (doc_id, score) pairs, best first."""
+        scores = defaultdict(float)
+        for term, qtf in Counter(tokenize(query)).items():
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for doc_index, tf in docs:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_index] / self.avg_length)
+                scores[doc_index] += qtf * idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.doc_ids[doc_index], score) for doc_index, score in best]
+
+    def save(self, path):
+        # 임시 파일에 쓴 뒤 교체
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"doc_ids": self.doc_ids, "doc_lengths": self.doc_lengths, "postings": self.postings},
+                file,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        postings = {term: [tuple(item) for item in docs] for term, docs in data["postings"].items()}
+        return cls(data["doc_ids"], data["doc_lengths"], postings)
+
+# BM25 색인 파일 경로 (FAISS 인덱스와 같은 위치)
+def lexical_index_path(index_path):
+    return f"{index_path}.bm25.json"
+
+# 벡터스토어에 들어 있는 문서로 BM25 색인 생성
+def build_lexical_index(vectorstore):
+    return LexicalIndex.build(
+        (doc_id, vectorstore.docstore.search(doc_id).page_content)
+        for doc_id in vectorstore.index_to_docstore_id.values()
+    )
+
+# 여러 순위 목록을 Reciprocal Rank Fusion으로 합치기
+def reciprocal_rank_fusion(rankings, k=5, c=60):
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (c + rank + 1)
+    return [doc_id for doc_id, _ in heapq.nlargest(k, scores.items(), key=lambda item: item[1])]
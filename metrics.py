@@ -0,0 +1,119 @@
+from contextlib import contextmanager
+import bisect
+import threading
+import time
+
+# 처리 시간 히스토그램의 기본 구간 (초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+def _number(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+# 프로세스 단위 누적 카운터 (Prometheus counter)
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.samples()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+# 값을 다른 객체에서 읽어오는 카운터 (캐시의 hits/misses처럼 이미 집계된 값)
+# callback은 (라벨 값 튜플, 값) 목록을 반환
+class CallbackCounter(Counter):
+    def __init__(self, name, help, labelnames, callback):
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+
+    def samples(self):
+        return list(self.callback())
+
+# 구간별 누적 개수와 합계를 기록하는 히스토그램 (Prometheus histogram)
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # 라벨 값 튜플 → [구간별 개수..., +Inf 개수], 합계
+        self._counts = {}
+        self._sums = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _labels(self.labelnames + ("le",), key + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+def render_metrics(metrics):
+    """Render metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+# 요청 하나의 단계별 처리 시간: 히스토그램에 기록하고 Server-Timing 헤더 값으로 변환
+class StageTimer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def record(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self.histogram.observe(seconds, stage=stage)
+
+    @contextmanager
+    def measure(self, stage):
+        """Time the block as stage (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def finish(self):
+        """Record the total request time."""
+        self.record("total", time.perf_counter() - self.started)
+
+    def milliseconds(self):
+        return {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+
+    def server_timing(self):
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.milliseconds().items())
@@ -0,0 +1,65 @@
+from langchain_community.docstore.base import Docstore
+from langchain.vectorstores import FAISS
+from langchain.schema import Document
+from chunk_corpus import ChunkCorpus, write_corpus
+from collections.abc import Mapping
+import faiss
+
+# 문서 저장소 파일 경로 (FAISS 인덱스와 같은 위치, 레코드 순서 = FAISS 벡터 순서)
+def docstore_path(index_path):
+    return f"{index_path}.docs"
+
+def write_docstore(vectorstore, index_path):
+    """Write the documents of vectorstore as an mmap-able file, one record (doc id, text) per FAISS row."""
+    entries = []
+    for position in range(len(vectorstore.index_to_docstore_id)):
+        doc_id = vectorstore.index_to_docstore_id[position]
+        entries.append((doc_id, vectorstore.docstore.search(doc_id).page_content))
+    write_corpus(docstore_path(index_path), entries)
+
+# pickle 대신 메모리 맵 파일에서 필요한 문서만 읽는 읽기 전용 문서 저장소
+# 여러 워커 프로세스가 같은 파일을 열면 페이지 캐시를 함께 사용
+class MmapDocstore(Docstore):
+    def __init__(self, path):
+        self.corpus = ChunkCorpus(path)
+
+    def document(self, position):
+        doc_id = self.corpus.name(position)
+        return Document(
+            id=doc_id,
+            page_content=self.corpus.content(position),
+            metadata={"chunk": doc_id.rsplit("#", 1)[0], "hash": self.corpus.content_hash(position)},
+        )
+
+    def search(self, search):
+        position = self.corpus.position(search)
+        if position is None:
+            return f"ID {search} not found."
+        return self.document(position)
+
+# FAISS 벡터 순서 → 문서 id 매핑 (문서 저장소의 이름 목록을 그대로 사용)
+class PositionIds(Mapping):
+    def __init__(self, doc_ids):
+        self.doc_ids = doc_ids
+
+    def __getitem__(self, position):
+        if not 0 <= position < len(self.doc_ids):
+            raise KeyError(position)
+        return self.doc_ids[position]
+
+    def __iter__(self):
+        return iter(range(len(self.doc_ids)))
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+def load_mmap_vector_store(index_path, embeddings):
+    """Open the FAISS index and docstore with memory mapping (read-only; use load_vector_store to modify)."""
+    # 평면 인덱스는 벡터를 복사하지 않고 파일을 그대로 매핑
+    index = faiss.read_index(f"{index_path}.faiss", faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    docstore = MmapDocstore(docstore_path(index_path))
+    if len(docstore.corpus) != index.ntotal:
+        raise ValueError(
+            f"문서 저장소와 인덱스의 문서 수가 다릅니다 ({len(docstore.corpus)} != {index.ntotal}): {index_path}"
+        )
+    return FAISS(embeddings, index, docstore, PositionIds(docstore.corpus.names()))
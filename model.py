@@ -1,48 +1,327 @@
 from langchain.vectorstores import FAISS
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_openai import OpenAIEmbeddings
+from config import (
+    OPENAI_BASE_URL, EMBED_TOKENIZE, EMBED_CACHE_PATH, EMBED_CACHE_MAX_ENTRIES,
+    EMBED_BATCH_SIZE, EMBED_MAX_IN_FLIGHT, EMBED_MAX_RETRIES, CORPUS_PATH,
+    INDEX_TYPE, INDEX_VECTOR_DTYPE, INDEX_NLIST, INDEX_PQ_M, INDEX_HNSW_M,
+    EMBEDDING_BACKEND, EMBEDDING_DIM, EMBEDDING_NGRAMS,
+)
+from embedding_backends import EMBEDDING_BACKENDS, HashedNgramEmbeddings
+from ann_index import FLAT_SPEC, make_index_spec, train_index, supports_remove
+from chunk_corpus import open_corpus
+from embedding_cache import CachedEmbeddings, get_embedding_cache
+from embedding_pipeline import embed_texts
+from lexical_index import build_lexical_index, lexical_index_path
+from mmap_docstore import docstore_path, write_docstore, load_mmap_vector_store
+import numpy as np
 import os
-import glob
 import json
+import time
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
 
-# JSON 데이터 로드 함수
-def load_all_chunks(folder_path):
-    """Load pre-chunked JSON data from a specified folder."""
-    all_chunks = []
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 빌드
+    fcntl = None
+
+# 로컬 CPU 임베딩 (설정한 차원과 n-gram 길이)
+def make_local_embeddings():
+    return HashedNgramEmbeddings(EMBEDDING_DIM, EMBEDDING_NGRAMS)
+
+# 임베딩 생성 함수: openai 백엔드는 디스크 임베딩 캐시를 거쳐서 호출, 로컬 백엔드는 캐시 조회보다 계산이 빨라 바로 사용
+def make_embeddings(embedding_model="text-embedding-ada-002", api_key=None, http_client=None, http_async_client=None,
+                    backend=None):
+    """Create the embedding backend shared by index builds and query-time retrieval (backend default: config)."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "hashed_ngram":
+        return make_local_embeddings()
+    if backend != "openai":
+        raise ValueError(f"지원하지 않는 임베딩 백엔드입니다: {backend} (가능한 값: {', '.join(EMBEDDING_BACKENDS)})")
+    embeddings = OpenAIEmbeddings(
+        model=embedding_model,
+        openai_api_key=api_key,
+        base_url=OPENAI_BASE_URL,
+        check_embedding_ctx_length=EMBED_TOKENIZE,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+    cache = get_embedding_cache(EMBED_CACHE_PATH, max_entries=EMBED_CACHE_MAX_ENTRIES)
+    return CachedEmbeddings(embeddings, embedding_model, cache)
+
+# 환경 변수로 지정한 벡터 인덱스 설정
+def default_index_spec():
+    return make_index_spec(INDEX_TYPE, INDEX_VECTOR_DTYPE, INDEX_NLIST, INDEX_PQ_M, INDEX_HNSW_M)
+
+# 새 벡터스토어 생성: 설정한 종류의 인덱스를 이번에 임베딩한 벡터로 학습한 뒤 추가
+def new_vector_store(embeddings, texts, vectors, metadatas, ids, index_spec):
+    index = train_index(np.asarray(vectors, dtype=np.float32), index_spec)
+    vectorstore = FAISS(embeddings, index, InMemoryDocstore(), {})
+    vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+    return vectorstore
+
+# 인덱스를 만든 임베딩 (manifest에 벡터 차원과 함께 기록하고, 다른 임베딩으로 만든 인덱스와 섞지 않음)
+def embedding_identity(backend=None, embedding_model="text-embedding-ada-002"):
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "hashed_ngram":
+        embedding_model = make_local_embeddings().model
+    return {"embedding_backend": backend, "embedding_model": embedding_model}
+
+# manifest에 기록된 임베딩 (백엔드 기록이 없는 이전 인덱스는 openai)
+def manifest_embedding(manifest):
+    return {
+        "embedding_backend": manifest.get("embedding_backend", "openai"),
+        "embedding_model": manifest.get("embedding_model"),
+    }
+
+def check_index_embedding(index_path, embedding, index_dim, query_dim=None):
+    """Raise ValueError unless the index was built with the given embedding identity (and query_dim, if known)."""
+    manifest = load_manifest(index_path)
+    built = manifest_embedding(manifest or {})
+    if built["embedding_backend"] != embedding["embedding_backend"] or (
+        built["embedding_model"] is not None and built["embedding_model"] != embedding["embedding_model"]
+    ):
+        raise ValueError(
+            f"인덱스는 {built['embedding_backend']}/{built['embedding_model']} 임베딩으로 만들어졌지만 "
+            f"{embedding['embedding_backend']}/{embedding['embedding_model']} 임베딩으로 검색하도록 설정되어 있습니다. "
+            f"설정을 맞추거나 python build_index.py로 인덱스를 다시 만드세요: {index_path}"
+        )
+    if query_dim is not None and query_dim != index_dim:
+        raise ValueError(f"질의 벡터 차원({query_dim})과 인덱스 차원({index_dim})이 다릅니다: {index_path}")
+
+# 청크 내용 해시
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+# 인덱스 파일의 (수정 시각, 크기) 서명
+# companions=True면 함께 교체되는 mmap 문서 저장소와 BM25 색인도 포함 (이전 인덱스에는 없을 수 있으므로 없으면 None)
+def index_file_signature(index_path, companions=False):
     try:
-        for file_path in glob.glob(os.path.join(folder_path, "*.json")):
-            with open(file_path, "r", encoding="utf-8") as file:
-                data = json.load(file)
-                if "content" in data:
-                    chunk = {"content": data["content"], "source": file_path}
-                    all_chunks.append(chunk)
-    except Exception as e:
-        print(f"JSON 파일 로드 중 오류 발생: {e}")
-    return all_chunks
+        signature = [
+            [os.stat(path).st_mtime_ns, os.stat(path).st_size]
+            for path in (f"{index_path}.faiss", f"{index_path}.pkl")
+        ]
+    except FileNotFoundError:
+        return None
+    if companions:
+        for path in (docstore_path(index_path), lexical_index_path(index_path)):
+            try:
+                signature.append([os.stat(path).st_mtime_ns, os.stat(path).st_size])
+            except FileNotFoundError:
+                signature.append(None)
+    return signature
 
-# FAISS 벡터스토어 및 리트리버 설정 함수
-def setup_vector_store(data_folder, index_save_path, embedding_model="text-embedding-ada-002", api_key=None):
-    """Set up FAISS vector store from pre-chunked data."""
+# 인덱스에 들어 있는 청크 목록(manifest) 로드
+def load_manifest(index_path):
+    """Load the manifest written next to the index, or None if it is missing or unreadable."""
+    try:
+        with open(f"{index_path}.manifest.json", "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+# 저장된 문서 메타데이터로부터 manifest 복원 (manifest가 없거나 어긋난 경우)
+def manifest_from_store(vectorstore):
+    chunks = {}
+    for doc_id, doc in vectorstore.docstore._dict.items():
+        if "chunk" in doc.metadata and "hash" in doc.metadata:
+            chunks[doc.metadata["chunk"]] = {"hash": doc.metadata["hash"], "id": doc_id}
+    return chunks
+
+# 임시 폴더에 저장한 뒤 교체해서 읽는 쪽이 반쯤 쓰인 파일을 보지 않도록 저장
+def save_vector_store_atomic(vectorstore, index_save_path, chunks, embedding, index_spec=FLAT_SPEC):
+    # BM25 색인과 mmap 문서 저장소를 먼저 기록해서 FAISS 파일이 바뀌었을 때는 항상 짝이 맞는 파일이 있도록 함
+    build_lexical_index(vectorstore).save(lexical_index_path(index_save_path))
+    write_docstore(vectorstore, index_save_path)
+
+    folder, index_name = os.path.split(index_save_path)
+    tmp_folder = tempfile.mkdtemp(prefix=f".{index_name}-", dir=folder)
+    try:
+        vectorstore.save_local(tmp_folder, index_name=index_name)
+        for ext in ("pkl", "faiss"):
+            os.replace(os.path.join(tmp_folder, f"{index_name}.{ext}"), f"{index_save_path}.{ext}")
+    finally:
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+    write_manifest(index_save_path, chunks, embedding, vectorstore.index.d, index_spec)
+
+# 인덱스 파일 서명과 함께 manifest 기록
+def write_manifest(index_save_path, chunks, embedding, embedding_dim, index_spec=FLAT_SPEC):
+    manifest = {
+        **embedding,
+        "embedding_dim": embedding_dim,
+        "index": index_spec,
+        "index_signature": index_file_signature(index_save_path),
+        "chunks": chunks,
+    }
+    tmp_manifest = f"{index_save_path}.manifest.json.tmp"
+    with open(tmp_manifest, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, ensure_ascii=False)
+    os.replace(tmp_manifest, f"{index_save_path}.manifest.json")
+
+# 같은 인덱스를 여러 프로세스(uvicorn 워커, build_index.py)가 동시에 빌드하지 않도록 잠금 파일로 순서를 정함
+# 먼저 빌드한 프로세스가 끝나면 다음 프로세스는 manifest를 보고 변경 없음으로 바로 끝남
+@contextmanager
+def index_build_lock(index_save_path):
+    if fcntl is None:
+        yield
+        return
+    with open(f"{index_save_path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# 변경된 청크만 임베딩하는 증분 인덱스 빌드 함수
+def build_index(data_folder, index_save_path, embedding_model="text-embedding-ada-002", api_key=None,
+                batch_size=None, max_in_flight=None, corpus_path=None, index_spec=None, retrain=False,
+                embedding_backend=None):
+    """Bring the saved FAISS index in line with the chunk folder, embedding only new or changed chunks.
+
+    index_spec (default: from config) selects the FAISS index type; changing it, or retrain=True,
+    retrains the index on all chunks (embeddings come from the cache). An index built with a different
+    embedding backend or model is rebuilt from scratch, never extended.
+    Returns (vectorstore, stats). vectorstore is None when nothing changed and the index was left untouched.
+    """
     os.makedirs(os.path.dirname(index_save_path), exist_ok=True)  # Ensure directory exists
+    with index_build_lock(index_save_path):
+        return _build_index(
+            data_folder, index_save_path, embedding_model, api_key, batch_size, max_in_flight, corpus_path,
+            index_spec or default_index_spec(), retrain, embedding_backend or EMBEDDING_BACKEND,
+        )
+
+def _build_index(data_folder, index_save_path, embedding_model, api_key, batch_size, max_in_flight, corpus_path,
+                 index_spec, retrain, embedding_backend):
+    started = time.perf_counter()
+    embedding = embedding_identity(embedding_backend, embedding_model)
 
-    # 문서 로드 및 변환
-    documents = []
-    for chunk in load_all_chunks(data_folder):
-        content = chunk.get("content", "")
-        metadata = {"source": chunk.get("source", "unknown")}
-        documents.append(Document(page_content=content, metadata=metadata))
+    # 현재 청크 폴더 상태: 코퍼스 레코드의 이름과 해시만 읽고 본문은 임베딩할 청크만 디코딩
+    corpus = open_corpus(data_folder, corpus_path or CORPUS_PATH)
+    current = {}
+    for position, name in enumerate(corpus.names()):
+        current[name] = {"position": position, "hash": corpus.content_hash(position)}
 
-    if not documents:
+    if not current:
         raise ValueError("로드된 문서가 없습니다. 데이터 폴더를 확인하세요.")
 
-    # 임베딩 생성 및 FAISS 벡터스토어 구축
-    embeddings = OpenAIEmbeddings(model=embedding_model, openai_api_key=api_key)
-    vectorstore = FAISS.from_documents(documents, embeddings)
+    # 현재 인덱스에 들어 있는 청크 목록
+    vectorstore = None
+    indexed = {}
+    signature = index_file_signature(index_save_path)
+    manifest = load_manifest(index_save_path)
+    if signature is None or retrain or (manifest and (
+        manifest_embedding(manifest) != embedding or manifest.get("index", FLAT_SPEC) != index_spec
+    )):
+        pass  # 인덱스가 없거나 임베딩 백엔드 / 모델 / 인덱스 설정이 바뀌었으면 전체 생성
+    elif manifest and manifest.get("index_signature") == signature:
+        indexed = manifest["chunks"]
+    else:
+        # manifest 기록 이후 인덱스 파일이 바뀌었으면 저장된 문서 메타데이터로 복원
+        vectorstore = load_vector_store(index_save_path)
+        indexed = manifest_from_store(vectorstore)
+        if len(indexed) != len(vectorstore.index_to_docstore_id):
+            # 청크 정보가 없는 이전 형식의 인덱스는 전체 재생성
+            vectorstore, indexed = None, {}
+
+    removed = [name for name, entry in indexed.items() if current.get(name, {}).get("hash") != entry["hash"]]
+    stats = {"removed": len(removed)}
+    if removed and not supports_remove(index_spec):
+        # HNSW / IVF 인덱스에서는 라벨을 유지한 채 벡터를 삭제할 수 없으므로 전체 재생성 (남은 청크의 임베딩은 캐시에서 읽음)
+        vectorstore, indexed, removed = None, {}, []
+    added = [name for name, entry in current.items() if indexed.get(name, {}).get("hash") != entry["hash"]]
+    stats.update(added=len(added), unchanged=len(current) - len(added))
+
+    # 임베딩할 청크의 본문만 디코딩
+    for name in added:
+        current[name]["content"] = corpus.content(current[name]["position"])
+    corpus.close()
+
+    if not added and not removed:
+        if vectorstore is not None:
+            # 메타데이터로 복원한 경우 다음 빌드부터 빠르게 확인하도록 manifest만 다시 기록
+            write_manifest(index_save_path, indexed, embedding, vectorstore.index.d, index_spec)
+        if not os.path.exists(lexical_index_path(index_save_path)):
+            # BM25 색인이 없는 이전 인덱스는 색인만 추가 생성
+            if vectorstore is None:
+                vectorstore = load_vector_store(index_save_path)
+            build_lexical_index(vectorstore).save(lexical_index_path(index_save_path))
+        if not os.path.exists(docstore_path(index_save_path)):
+            # mmap 문서 저장소가 없는 이전 인덱스는 저장소만 추가 생성
+            if vectorstore is None:
+                vectorstore = load_vector_store(index_save_path)
+            write_docstore(vectorstore, index_save_path)
+        stats["seconds"] = time.perf_counter() - started
+        return None, stats
 
-    # FAISS 벡터스토어 저장
-    vectorstore.save_local(index_save_path)
+    if vectorstore is None and indexed:
+        vectorstore = load_vector_store(index_save_path)
+
+    # 삭제되었거나 내용이 바뀐 청크의 벡터 제거
+    if removed and vectorstore is not None:
+        vectorstore.delete([indexed[name]["id"] for name in removed])
+
+    # 새로 생겼거나 내용이 바뀐 청크만 임베딩
+    chunks = {name: entry for name, entry in indexed.items() if name not in removed}
+    if added:
+        embeddings = make_embeddings(embedding_model, api_key, backend=embedding_backend)
+        texts, metadatas, ids = [], [], []
+        for name in added:
+            entry = current[name]
+            doc_id = f"{name}#{entry['hash'][:16]}"
+            texts.append(entry["content"])
+            metadatas.append({"source": os.path.join(data_folder, name), "chunk": name, "hash": entry["hash"]})
+            ids.append(doc_id)
+            chunks[name] = {"hash": entry["hash"], "id": doc_id}
+        # 배치 단위로 동시에 임베딩하고, 완료된 배치는 캐시에 바로 기록 (중단 시 이어서 진행)
+        vectors, embed_stats = embed_texts(
+            embeddings, texts,
+            batch_size=batch_size or EMBED_BATCH_SIZE,
+            max_in_flight=max_in_flight or EMBED_MAX_IN_FLIGHT,
+            max_retries=EMBED_MAX_RETRIES,
+        )
+        stats.update(embed_stats)
+        if vectorstore is not None and vectorstore.index_to_docstore_id and vectorstore.index.d != len(vectors[0]):
+            # manifest 없이 복원한 인덱스가 다른 차원의 임베딩으로 만들어진 경우 섞지 않음
+            raise ValueError(
+                f"새 임베딩 차원({len(vectors[0])})이 인덱스 차원({vectorstore.index.d})과 다릅니다. "
+                f"--retrain으로 인덱스를 다시 만드세요: {index_save_path}"
+            )
+        if vectorstore is None or not vectorstore.index_to_docstore_id:
+            vectorstore = new_vector_store(embeddings, texts, vectors, metadatas, ids, index_spec)
+        else:
+            vectorstore.embedding_function = embeddings
+            vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+    save_vector_store_atomic(vectorstore, index_save_path, chunks, embedding, index_spec)
+    stats["seconds"] = time.perf_counter() - started
+    return vectorstore, stats
+
+# FAISS 벡터스토어 및 리트리버 설정 함수
+def setup_vector_store(data_folder, index_save_path, embedding_model="text-embedding-ada-002", api_key=None):
+    """Set up FAISS vector store from pre-chunked data."""
+    vectorstore, _ = build_index(data_folder, index_save_path, embedding_model, api_key=api_key)
+    if vectorstore is None:
+        vectorstore = load_vector_store(index_save_path)
     return vectorstore
 
+# 저장된 FAISS 벡터스토어 로드 함수
+def load_vector_store(index_path, embeddings=None, mmap=False):
+    """Load a FAISS vector store saved by setup_vector_store.
+
+    With mmap=True the index and documents are memory-mapped read-only instead of unpickled.
+    """
+    folder, index_name = os.path.split(index_path)
+    if embeddings is None:
+        # 질의 임베딩은 요청마다 사용자 키로 따로 계산하므로 로드용 임베딩은 키 없이 생성
+        embeddings = OpenAIEmbeddings(openai_api_key="unused")
+    if mmap:
+        return load_mmap_vector_store(index_path, embeddings)
+    # 직접 생성한 인덱스 파일만 읽으므로 pickle 역직렬화를 허용
+    return FAISS.load_local(folder, embeddings, index_name=index_name, allow_dangerous_deserialization=True)
+
 # FAISS 벡터스토어 및 리트리버 로드
 index_path = "./data/vectorstore/faiss_index"
 chunks_folder = "./data/chunks/"
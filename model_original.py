@@ -6,12 +6,9 @@ from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.messages import ChatMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
-from langchain.vectorstores import FAISS
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.schema import Document
+# 인덱스 생성 / 로드는 build_index.py, server.py와 같은 함수와 파일 형식(faiss_index.faiss / .pkl)을 사용
+from model import make_embeddings, setup_vector_store, load_vector_store
 import os
-import glob
-import json
 from dotenv import load_dotenv
 
 # Streamlit 페이지 설정
@@ -39,62 +36,23 @@ with st.sidebar:
 # 대화 기록 출력
 print_messages()
 
-# JSON 데이터 로드 함수
-# okay
-def load_all_chunks(folder_path):
-    """Load pre-chunked JSON data from a specified folder."""
-    all_chunks = []
-    try:
-        for file_path in glob.glob(os.path.join(folder_path, "*.json")):
-            with open(file_path, "r", encoding="utf-8") as file:
-                data = json.load(file)
-                if "content" in data:
-                    chunk = {"content": data["content"], "source": file_path}
-                    all_chunks.append(chunk)
-    except Exception as e:
-        st.error(f"JSON 파일 로드 중 오류 발생: {e}")
-    return all_chunks
-
-# FAISS 벡터스토어 및 리트리버 설정 함수
-# okay
-def setup_vector_store(data_folder, index_save_path, embedding_model="text-embedding-ada-002"):
-    """Set up FAISS vector store from pre-chunked data."""
-    os.makedirs(os.path.dirname(index_save_path), exist_ok=True)  # Ensure directory exists
-
-    # 문서 로드 및 변환
-    documents = []
-    for chunk in load_all_chunks(data_folder):
-        content = chunk.get("content", "")
-        metadata = {"source": chunk.get("source", "unknown")}
-        documents.append(Document(page_content=content, metadata=metadata))
-
-    if not documents:
-        raise ValueError("로드된 문서가 없습니다. 데이터 폴더를 확인하세요.")
-
-    # 임베딩 생성 및 FAISS 벡터스토어 구축
-    embeddings = OpenAIEmbeddings(model=embedding_model)
-    vectorstore = FAISS.from_documents(documents, embeddings)
-
-    # FAISS 벡터스토어 저장
-    vectorstore.save_local(index_save_path)
-    return vectorstore
-
 # FAISS 벡터스토어 및 리트리버 로드
 index_path = "data/vectorstore/faiss_index"
 chunks_folder = "data/chunks/"
 
-if "vectorstore" not in st.session_state:
+# 벡터스토어는 세션마다가 아니라 프로세스에서 한 번만 로드해서 모든 세션이 공유
+@st.cache_resource(show_spinner="FAISS 인덱스를 불러오는 중입니다...")
+def get_vectorstore(index_path, chunks_folder):
     # 최초 실행 시 인덱스 파일 확인 및 로드
     faiss_file = f"{index_path}.faiss"
     pkl_file = f"{index_path}.pkl"
 
     if not (os.path.exists(faiss_file) and os.path.exists(pkl_file)):
         st.info(f"FAISS 인덱스 파일이 없습니다. 새로 생성합니다: {index_path}")
-        st.session_state["vectorstore"] = setup_vector_store(chunks_folder, index_path)
-    else:
-        st.session_state["vectorstore"] = FAISS.load_local(index_path, OpenAIEmbeddings())
+        return setup_vector_store(chunks_folder, index_path, api_key=OPENAI_API_KEY or None)
+    return load_vector_store(index_path, make_embeddings())
 
-retriever = st.session_state["vectorstore"].as_retriever(search_type="similarity", search_kwargs={"k": 5})
+retriever = get_vectorstore(index_path, chunks_folder).as_retriever(search_type="similarity", search_kwargs={"k": 5})
 
 # 프롬프트 데이터 로드 함수
 def load_prompt(file_path):
@@ -132,6 +90,11 @@ def truncate_messages(messages, max_tokens=6000):
         current_length += message_length
     return truncated_messages
 
+# 모델 (클라이언트를 재실행마다 새로 만들지 않도록 캐시, 스트리밍 콜백은 호출할 때 전달)
+@st.cache_resource
+def get_llm():
+    return ChatOpenAI(model="gpt-4", streaming=True, max_tokens=500)
+
 # 사용자 입력 처리
 if user_input := st.chat_input("궁금한 것을 입력하세요."):
     # 리트리버에서 문서 검색
@@ -147,8 +110,7 @@ if user_input := st.chat_input("궁금한 것을 입력하세요."):
     with st.chat_message("assistant"):
         stream_handler = StreamHandler(st.empty())
 
-        # 모델 생성
-        llm = ChatOpenAI(model="gpt-4", streaming=True, callbacks=[stream_handler], max_tokens=500)
+        llm = get_llm()
 
         # 프롬프트 생성
         prompt = ChatPromptTemplate.from_messages(
@@ -177,7 +139,7 @@ if user_input := st.chat_input("궁금한 것을 입력하세요."):
         # 사용자 입력 처리 및 AI 응답 생성
         response = chain_with_memory.invoke(
             {"question": user_input},
-            config={"configurable": {"session_id": session_id}},
+            config={"configurable": {"session_id": session_id}, "callbacks": [stream_handler]},
         )
         st.session_state["messages"].append(
             ChatMessage(role="assistant", content=response.content)
@@ -0,0 +1,51 @@
+from lexical_index import reciprocal_rank_fusion
+from ann_index import search_params
+import numpy as np
+
+# FAISS 벡터 검색: 질의 벡터 행렬을 한 번의 검색 호출로 처리하고 질의마다 가까운 순서의 문서 id 목록 반환
+# nprobe (IVF) / ef_search (HNSW)는 요청마다 전달해서 인덱스 공유 상태를 바꾸지 않음 (정확 검색 인덱스에서는 무시)
+def vector_search_batch(vectorstore, query_vectors, k, nprobe=None, ef_search=None):
+    vectors = np.asarray(query_vectors, dtype=np.float32)
+    params = search_params(vectorstore.index, nprobe, ef_search)
+    _, indices = vectorstore.index.search(vectors, k, params=params)
+    return [[vectorstore.index_to_docstore_id[i] for i in row if i != -1] for row in indices]
+
+def vector_search(vectorstore, query_vector, k, nprobe=None, ef_search=None):
+    return vector_search_batch(vectorstore, [query_vector], k, nprobe=nprobe, ef_search=ef_search)[0]
+
+# 문서 id 목록을 Document 목록으로 변환
+def docs_for_ids(vectorstore, doc_ids):
+    return [vectorstore.docstore.search(doc_id) for doc_id in doc_ids]
+
+def hybrid_search_batch(vectorstore, lexical, questions, query_vectors, k=5, candidates=20, rrf_c=60,
+                        nprobe=None, ef_search=None):
+    """hybrid_search for many questions at once; returns one Document list per question.
+
+    The FAISS part is a single multi-query search over the (n, dim) query_vectors matrix.
+    """
+    vector_rankings = [None] * len(questions)
+    if query_vectors is not None and len(questions):
+        vector_rankings = vector_search_batch(
+            vectorstore, query_vectors, candidates if lexical is not None else k, nprobe=nprobe, ef_search=ef_search,
+        )
+    results = []
+    for question, vector_ranking in zip(questions, vector_rankings):
+        rankings = []
+        if lexical is not None:
+            rankings.append([doc_id for doc_id, _ in lexical.search(question, candidates)])
+        if vector_ranking is not None:
+            rankings.append(vector_ranking)
+        results.append(docs_for_ids(vectorstore, reciprocal_rank_fusion(rankings, k=k, c=rrf_c)))
+    return results
+
+def hybrid_search(vectorstore, lexical, question, query_vector, k=5, candidates=20, rrf_c=60,
+                  nprobe=None, ef_search=None):
+    """Fuse BM25 and FAISS rankings with reciprocal rank fusion.
+
+    Falls back to a single ranking when query_vector (embedding unavailable)
+    or lexical (no BM25 index) is None.
+    """
+    return hybrid_search_batch(
+        vectorstore, lexical, [question], None if query_vector is None else [query_vector],
+        k=k, candidates=candidates, rrf_c=rrf_c, nprobe=nprobe, ef_search=ef_search,
+    )[0]
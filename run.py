@@ -1,48 +1,168 @@
+import argparse
+import os
+import signal
 import subprocess
+import sys
+import threading
 import time
+import urllib.error
+import urllib.request
 
-def run_server():
+
+class ShutdownRequested(Exception):
+    pass
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the FastAPI server and the Streamlit frontend.")
+    parser.add_argument(
+        "--prod", action="store_true",
+        help="production mode: several API workers, no auto-reload, headless Streamlit",
+    )
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", os.cpu_count() or 1)),
+                        help="number of uvicorn workers in production mode (default: API_WORKERS or CPU count)")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--frontend-port", type=int, default=int(os.getenv("FRONTEND_PORT", "8501")))
+    parser.add_argument("--ready-timeout", type=float, default=120.0,
+                        help="seconds to wait for the server to report ready")
+    parser.add_argument("--log-dir", default=None,
+                        help="write server.log / frontend.log here instead of prefixing lines to this terminal")
+    return parser.parse_args()
+
+
+def drain(stream, prefix):
+    """
+    Copy a child's output line by line so its pipe never fills up.
+    """
+    for line in iter(stream.readline, b""):
+        sys.stdout.write(f"[{prefix}] {line.decode('utf-8', errors='replace')}")
+        sys.stdout.flush()
+    stream.close()
+
+
+def start_process(name, command, log_dir, env=None):
+    """
+    Start a child process whose output is drained to the terminal or written to a log file.
+    """
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        log_file = open(os.path.join(log_dir, f"{name}.log"), "ab")
+        process = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT, env=env)
+        log_file.close()
+        return process
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+    threading.Thread(target=drain, args=(process.stdout, name), daemon=True).start()
+    return process
+
+
+def run_server(args):
     """
     Run the FastAPI server using uvicorn.
     """
-    print("Starting FastAPI server...")
-    server_process = subprocess.Popen(
-        ["uvicorn", "server:app", "--reload"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    return server_process
+    command = [sys.executable, "-m", "uvicorn", "server:app", "--host", args.host, "--port", str(args.port)]
+    if args.prod:
+        print(f"Starting FastAPI server ({args.workers} workers)...")
+        command += ["--workers", str(args.workers), "--timeout-graceful-shutdown", "30", "--no-access-log"]
+    else:
+        print("Starting FastAPI server...")
+        command.append("--reload")
+    return start_process("server", command, args.log_dir)
+
 
-def run_frontend():
+def run_frontend(args):
     """
     Run the Streamlit frontend application.
     """
     print("Starting Streamlit frontend...")
-    frontend_process = subprocess.Popen(
-        ["streamlit", "run", "front.py"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    return frontend_process
+    command = [sys.executable, "-m", "streamlit", "run", "front.py", "--server.port", str(args.frontend_port)]
+    if args.prod:
+        command += ["--server.headless", "true", "--browser.gatherUsageStats", "false"]
+    env = dict(os.environ, API_BASE=f"http://{args.host}:{args.port}")
+    return start_process("frontend", command, args.log_dir, env=env)
+
+
+def wait_until_ready(url, process, timeout):
+    """
+    Poll url until it answers 200. Returns False if the process exits or the timeout passes.
+    """
+    deadline = time.monotonic() + timeout
+    last_status = None
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except urllib.error.HTTPError as e:
+            # 503 from /ready carries the reason the server is not ready yet
+            status = e.read().decode("utf-8", errors="replace")
+            if status != last_status:
+                print(f"Waiting for server: {status}")
+                last_status = status
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def stop(processes, timeout=35):
+    """
+    Send SIGTERM to every running child, then SIGKILL whatever is still alive after the timeout.
+    """
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        try:
+            process.wait(timeout=max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
 
 def main():
+    args = parse_args()
+
+    def request_shutdown(signum, frame):
+        raise ShutdownRequested()
+
+    signal.signal(signal.SIGTERM, request_shutdown)
+
+    processes = []
+    exit_code = 0
     try:
-        server_process = run_server()
-        # Give the server some time to start
-        time.sleep(2)
-        frontend_process = run_frontend()
-        
-        # Wait for both processes to complete (Ctrl+C to exit)
-        server_process.wait()
-        frontend_process.wait()
-    except KeyboardInterrupt:
+        server_process = run_server(args)
+        processes.append(server_process)
+        # In production the frontend only starts once the index is loaded and warm;
+        # in development the index may still be built lazily on the first question
+        ready_url = f"http://{args.host}:{args.port}/{'ready' if args.prod else 'health'}"
+        if not wait_until_ready(ready_url, server_process, args.ready_timeout):
+            print(f"Server did not become ready within {args.ready_timeout:.0f}s ({ready_url})")
+            return 1
+        print("Server is ready.")
+        frontend_process = run_frontend(args)
+        processes.append(frontend_process)
+
+        # Run until either process exits (Ctrl+C or SIGTERM to stop both)
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+        exited = next(process for process in processes if process.poll() is not None)
+        print(f"{'Server' if exited is server_process else 'Frontend'} exited with code {exited.returncode}")
+        exit_code = exited.returncode or 1
+    except (KeyboardInterrupt, ShutdownRequested):
         print("Shutting down processes...")
-        server_process.terminate()
-        frontend_process.terminate()
     except Exception as e:
         print(f"Error occurred: {e}")
-        server_process.terminate()
-        frontend_process.terminate()
+        exit_code = 1
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        # Stop the frontend first so no new requests reach the draining server
+        stop(list(reversed(processes)))
+    return exit_code
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
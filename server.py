@@ -1,17 +1,52 @@
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.vectorstores import FAISS
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
-from typing import List, Dict
-from fastapi import FastAPI
-from model import setup_vector_store, load_prompt
+from typing import List, Dict, Optional
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from model import setup_vector_store, load_prompt, make_embeddings, make_local_embeddings, embedding_identity
+from index_manager import VectorStoreManager
+from answer_cache import AnswerCache, normalize_question
+from retrieval import hybrid_search, hybrid_search_batch
+from context_packer import pack_context, truncate_to_tokens, count_tokens
+from session_memory import SessionMemory
+from embedding_cache import get_embedding_cache
+from client_pool import ClientPool
+from single_flight import SingleFlight
+from metrics import Counter, CallbackCounter, Histogram, StageTimer, render_metrics
+from config import (
+    INDEX_PATH, INDEX_STORAGE, CHUNKS_FOLDER, OPENAI_BASE_URL, RETRIEVAL_WORKERS,
+    EMBED_TIMEOUT, SEARCH_TIMEOUT, LLM_TIMEOUT, EMBEDDING_MODEL, EMBEDDING_BACKEND,
+    ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_MAX_HISTORY,
+    RETRIEVAL_MODE, RETRIEVAL_CANDIDATES, LEXICAL_FALLBACK_TIMEOUT, INDEX_NPROBE, INDEX_EF_SEARCH,
+    CONTEXT_CANDIDATES, CONTEXT_TOKEN_BUDGET, PROMPT_TOKEN_BUDGET,
+    SESSION_DB_PATH, SESSION_RECENT_MESSAGES, SESSION_TOKEN_BUDGET, SESSION_SUMMARY_BATCH, SUMMARY_MODEL,
+    EMBED_CACHE_PATH, EMBED_CACHE_MAX_ENTRIES, LOG_LEVEL, PROMPT_LOG_SAMPLE_RATE,
+    CLIENT_POOL_SIZE, CLIENT_IDLE_TIMEOUT, CLIENT_MAX_CONNECTIONS, BATCH_MAX_QUESTIONS, BATCH_LLM_CONCURRENCY,
+)
+import asyncio
+import hashlib
+import json
+import logging
+import numpy as np
 import os
+import random
+import time
+
+# 서버 로그 (uvicorn 로그와 별도로 레벨 지정)
+logger = logging.getLogger("jejujoa")
+logger.setLevel(LOG_LEVEL)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.propagate = False
 
 # FAISS 벡터스토어와 전처리된 문서 위치
-index_path = "./data/vectorstore/faiss_index"
-chunks_folder = "./data/chunks/"
+index_path = INDEX_PATH
+chunks_folder = CHUNKS_FOLDER
 faiss_file = f"{index_path}.faiss"
 pkl_file = f"{index_path}.pkl"
 
@@ -20,42 +55,249 @@ prompt_path = "data/prompts/prompt.txt"
 prompt_text = load_prompt(prompt_path)
 if not prompt_text:
     print("prompt를 불러오지 못했습니다.")
+# 시스템 프롬프트는 토큰 예산 안에서 줄 단위로 잘라서 한 번만 준비
+system_prompt = truncate_to_tokens(prompt_text or "", PROMPT_TOKEN_BUDGET)
+# 프롬프트가 바뀌면 답변 캐시가 무효화되도록 캐시 키에 포함
+prompt_hash = hashlib.sha256((prompt_text or "").encode("utf-8")).hexdigest()[:12]
+
+# 로컬 임베딩 백엔드는 API 키와 무관하므로 프로세스에서 하나만 사용 (openai 백엔드는 키별 클라이언트 풀)
+local_embeddings = make_local_embeddings() if EMBEDDING_BACKEND == "hashed_ngram" else None
+
+# 프로세스 전체에서 공유하는 벡터스토어 (읽기 전용, 설정한 임베딩으로 만든 인덱스만 로드)
+index_manager = VectorStoreManager(
+    index_path,
+    mmap=INDEX_STORAGE == "mmap",
+    embedding=embedding_identity(EMBEDDING_BACKEND, EMBEDDING_MODEL),
+    embedding_dim=local_embeddings.dim if local_embeddings is not None else None,
+)
+
+# 반복 질문용 답변 캐시 (인덱스 버전 + 프롬프트 해시별로 분리)
+answer_cache = AnswerCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl=ANSWER_CACHE_TTL,
+    similarity_threshold=ANSWER_CACHE_SIMILARITY,
+)
+
+# 세션별 대화 상태 (최근 메시지 + 요약)
+session_memory = SessionMemory(
+    SESSION_DB_PATH,
+    recent_messages=SESSION_RECENT_MESSAGES,
+    token_budget=SESSION_TOKEN_BUDGET,
+    summary_batch=SESSION_SUMMARY_BATCH,
+)
+
+# /metrics로 내보내는 지표 (워커 프로세스별로 집계)
+STAGE_SECONDS = Histogram(
+    "jejujoa_stage_seconds", "Time spent in each request stage (index_load, cache, embed, search, context, "
+    "llm_ttft, llm, total; batch_* for whole /ask/batch requests).", labelnames=("stage",),
+)
+TOKENS = Counter("jejujoa_tokens_total", "Prompt and completion tokens sent to and received from the LLM.",
+                 labelnames=("kind",))
+REQUESTS = Counter("jejujoa_requests_total", "Answered questions by endpoint and answer cache use.",
+                   labelnames=("endpoint", "cached"))
+COALESCED = Counter("jejujoa_coalesced_requests_total",
+                    "Requests answered by joining an identical in-flight generation.", labelnames=("endpoint",))
+ANSWER_CACHE_LOOKUPS = CallbackCounter(
+    "jejujoa_answer_cache_lookups_total", "Answer cache lookups by result.", ("result",),
+    lambda: [(("exact",), answer_cache.hits["exact"]), (("similar",), answer_cache.hits["similar"]),
+             (("miss",), answer_cache.misses)],
+)
+EMBEDDING_CACHE_LOOKUPS = CallbackCounter(
+    "jejujoa_embedding_cache_lookups_total", "Embedding cache lookups (index builds and queries) by result.",
+    ("result",),
+    lambda: [(("hit",), embedding_cache.hits), (("miss",), embedding_cache.misses)],
+)
+embedding_cache = get_embedding_cache(EMBED_CACHE_PATH, max_entries=EMBED_CACHE_MAX_ENTRIES)
+
+# API 키별로 재사용하는 LLM / 임베딩 클라이언트 (keep-alive 연결 공유)
+client_pool = ClientPool(
+    max_entries=CLIENT_POOL_SIZE, idle_timeout=CLIENT_IDLE_TIMEOUT, max_connections=CLIENT_MAX_CONNECTIONS
+)
+
+# CPU를 사용하는 FAISS 검색 전용 스레드 풀 (동시 실행 수 제한)
+retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+
+# 서버 시작 시 인덱스를 한 번 로드하고, 인덱스 파일 변경을 감시
+@asynccontextmanager
+async def lifespan(app):
+    started = time.perf_counter()
+    try:
+        if await asyncio.to_thread(index_manager.load):
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="index_load")
+    except Exception as e:
+        # 서버는 띄워두고 /ready에서 이유를 보고 (인덱스 파일이 바뀌면 감시 작업이 다시 로드)
+        logger.error("FAISS 인덱스 로드 실패: %s", e)
+    if local_embeddings is not None:
+        # 첫 질의가 NumPy 초기화 비용을 내지 않도록 미리 한 번 계산
+        local_embeddings.embed_query("제주 창업 지원")
+    watcher = asyncio.create_task(index_manager.watch())
+    yield
+    watcher.cancel()
+    await client_pool.aclose()
 
 # FastAPI 앱 초기화
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # 요청 모델 정의
 class QueryRequest(BaseModel):
     api_key: str
     question: str
     conversation: List[Dict[str, str]] = Field(default_factory=list)  # default는 빈 배열 
+    # session_id를 보내면 서버에 저장된 대화 상태(최근 메시지 + 요약)를 사용하고 이번 대화도 기록
+    session_id: Optional[str] = None
+    include_history: bool = True  # False면 기록만 하고 프롬프트에는 이전 대화를 넣지 않음 (빠른 질문용)
 
-# 응답 생성 함수: 기존 대화 내역을 포함해서 응답 생성 
-def generate_response(api_key, question, conversation):   
-    llm = ChatOpenAI(
-        model="gpt-4o",
-        temperature=0.1,
-        api_key=api_key,
+# 일괄 질문 요청 (대화 이력 없이 질문마다 독립적으로 답변)
+class BatchQueryRequest(BaseModel):
+    api_key: str
+    questions: List[str]
+    concurrency: Optional[int] = None  # 동시에 실행할 LLM 호출 수 (BATCH_LLM_CONCURRENCY 이하)
+
+# 단계별 타임아웃 적용 (초과 시 504 응답)
+async def run_stage(stage, awaitable, timeout):
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"{stage} 단계 시간 초과 ({timeout}초)")
+
+# 인덱스가 없을 때 첫 빌드(또는 로드)는 프로세스에서 한 번만 실행하고 나머지 요청은 기다림
+index_build_lock = asyncio.Lock()
+
+# 공유 벡터스토어 스냅샷 (vectorstore, version, BM25 색인) 가져오기 (인덱스가 없을 때만 생성)
+async def get_vectorstore(api_key, timer):
+    vectorstore, index_version, lexical = index_manager.snapshot()
+    if vectorstore is None:
+        with timer.measure("index_load"):
+            async with index_build_lock:
+                # 기다리는 동안 다른 요청이 빌드를 끝냈으면 그대로 사용
+                if not index_manager.is_loaded():
+                    if not (os.path.exists(faiss_file) and os.path.exists(pkl_file)):
+                        vectorstore = await asyncio.to_thread(
+                            setup_vector_store, chunks_folder, index_path, EMBEDDING_MODEL, api_key=api_key
+                        )
+                        await asyncio.to_thread(index_manager.publish, vectorstore)
+                    else:
+                        try:
+                            await asyncio.to_thread(index_manager.load)
+                        except Exception as e:
+                            raise HTTPException(status_code=503, detail=f"인덱스를 로드할 수 없습니다: {e}")
+        vectorstore, index_version, lexical = index_manager.snapshot()
+    return vectorstore, index_version, lexical
+
+# LLM 클라이언트: 같은 키와 설정이면 풀에 있는 클라이언트 재사용
+def build_llm(api_key, streaming=False, model="gpt-4o"):
+    return client_pool.get(
+        api_key,
+        ("llm", model, streaming),
+        lambda http_client, http_async_client: ChatOpenAI(
+            model=model,
+            temperature=0.1,
+            api_key=api_key,
+            base_url=OPENAI_BASE_URL,
+            streaming=streaming,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        ),
     )
-    
-    # 벡터스토어 생성
-    if not (os.path.exists(faiss_file) and os.path.exists(pkl_file)):
-        vectorstore = setup_vector_store(chunks_folder, index_path, api_key=api_key)
-    else:
-        vectorstore = FAISS.load_local(index_path, OpenAIEmbeddings(api_key=api_key))
 
-    retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
-    
-    relevant_docs = retriever.get_relevant_documents(question)
-    context = "\n".join([doc.page_content for doc in relevant_docs])
-    max_context_length = 3000  # 검색된 문서의 최대 길이 제한
-    context = context[:max_context_length]
-    
+# 질의 임베딩 클라이언트 (디스크 임베딩 캐시 포함, 풀에서 재사용)
+def get_embeddings(api_key):
+    if local_embeddings is not None:
+        return local_embeddings
+    return client_pool.get(
+        api_key,
+        ("embeddings", EMBEDDING_MODEL),
+        lambda http_client, http_async_client: make_embeddings(
+            EMBEDDING_MODEL, api_key=api_key, http_client=http_client, http_async_client=http_async_client
+        ),
+    )
+
+# 질의 임베딩: 사용자 키로 비동기 계산 (디스크 임베딩 캐시에 있으면 생략)
+# BM25 색인이 있으면 임베딩이 느리거나 실패할 때 None을 반환해서 키워드 검색만 사용
+async def embed_question(api_key, question, timer, lexical=None):
+    if lexical is not None and RETRIEVAL_MODE == "lexical":
+        return None
+    if local_embeddings is not None:
+        # 로컬 임베딩은 네트워크 없이 1ms 미만이므로 타임아웃 / 키워드 검색 대체 없이 바로 계산
+        with timer.measure("embed"):
+            return local_embeddings.embed_query(question)
+    if lexical is None or RETRIEVAL_MODE == "vector":
+        with timer.measure("embed"):
+            embeddings = get_embeddings(api_key)
+            return await run_stage("임베딩", embeddings.aembed_query(question), EMBED_TIMEOUT)
+    try:
+        with timer.measure("embed"):
+            embeddings = get_embeddings(api_key)
+            return await run_stage(
+                "임베딩", embeddings.aembed_query(question), min(EMBED_TIMEOUT, LEXICAL_FALLBACK_TIMEOUT)
+            )
+    except Exception as e:
+        logger.warning("질의 임베딩 실패, 키워드 검색만 사용: %s", getattr(e, "detail", e))
+        return None
+
+# 아직 질의 임베딩을 시도하지 않았음을 나타내는 값
+NOT_EMBEDDED = object()
+
+# 답변 캐시 조회: 같은 질문 → 임베딩이 거의 같은 질문 순으로 확인
+# 반환값: (캐시된 답변 또는 None, 질의 벡터 / None / NOT_EMBEDDED)
+async def lookup_answer_cache(api_key, question, conversation, timer):
+    if len(conversation) > ANSWER_CACHE_MAX_HISTORY:
+        return None, NOT_EMBEDDED
+    _, index_version, lexical = await get_vectorstore(api_key, timer)
+    namespace = answer_cache.namespace(index_version, prompt_hash, conversation)
+    with timer.measure("cache"):
+        answer = answer_cache.get_exact(namespace, question)
+    if answer is not None:
+        return answer, NOT_EMBEDDED
+    query_vector = await embed_question(api_key, question, timer, lexical)
+    if query_vector is None:
+        return None, None
+    with timer.measure("cache"):
+        return answer_cache.get_similar(namespace, query_vector), query_vector
+
+# 생성한 답변을 캐시에 저장 (짧은 대화 이력까지만)
+def store_answer(question, conversation, index_version, query_vector, answer):
+    if len(conversation) <= ANSWER_CACHE_MAX_HISTORY and answer:
+        namespace = answer_cache.namespace(index_version, prompt_hash, conversation)
+        answer_cache.put(namespace, question, query_vector, answer)
+
+# 검색 + 프롬프트 구성: LLM에 전달할 메시지, 인덱스 버전, 질의 벡터 반환
+async def build_messages(api_key, question, conversation, timer, query_vector=NOT_EMBEDDED):
+    vectorstore, index_version, lexical = await get_vectorstore(api_key, timer)
+
+    # BM25 + FAISS 하이브리드 검색은 전용 스레드 풀에서 실행
+    if query_vector is NOT_EMBEDDED:
+        query_vector = await embed_question(api_key, question, timer, lexical)
+    loop = asyncio.get_running_loop()
+    with timer.measure("search"):
+        relevant_docs = await run_stage(
+            "검색",
+            loop.run_in_executor(
+                retrieval_executor,
+                partial(
+                    hybrid_search, vectorstore, lexical if RETRIEVAL_MODE != "vector" else None, question,
+                    query_vector, k=CONTEXT_CANDIDATES, candidates=RETRIEVAL_CANDIDATES,
+                    nprobe=INDEX_NPROBE, ef_search=INDEX_EF_SEARCH,
+                ),
+            ),
+            SEARCH_TIMEOUT,
+        )
+    with timer.measure("context"):
+        # 컨텍스트 구성(문장 중복 제거, 토큰 계산)은 CPU 작업이므로 이벤트 루프 밖에서 실행
+        messages = await asyncio.to_thread(compose_messages, question, conversation, relevant_docs)
+    log_prompt(messages)
+    return messages, index_version, query_vector
+
+# 검색된 문서로 LLM 메시지 구성
+def compose_messages(question, conversation, relevant_docs):
+    # 토큰 예산 안에서 중복 문장을 제거하고 문장 단위로 컨텍스트 구성
+    context, _ = pack_context(relevant_docs, token_budget=CONTEXT_TOKEN_BUDGET)
+
     # 프롬프트 생성
     messages = [
         {
             "role": "system",
-            "content": f"{prompt_text[:1000]}\n\n아래는 리트리버에서 가져온 데이터입니다:\n{context}"
+            "content": f"{system_prompt}\n\n아래는 리트리버에서 가져온 데이터입니다:\n{context}"
         }
     ]
 
@@ -63,25 +305,438 @@ def generate_response(api_key, question, conversation):
     
     # conversation의 모든 항목을 messages list의 끝에 추가
     messages.extend(conversation)
-    print(messages)
     # 현재 질문 추가
     messages.append({"role": "user", "content": question})
+    return messages
 
-    # LLM에게 메시지 전달
-    response = llm(messages)
+# 프롬프트 전체는 DEBUG 레벨에서 일부 요청만 기록 (매 요청 출력은 부하가 걸리면 그 자체로 비용)
+def log_prompt(messages):
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < PROMPT_LOG_SAMPLE_RATE:
+        logger.debug("prompt: %s", json.dumps(messages, ensure_ascii=False))
+
+# LLM 입출력 토큰 수 집계 (스트리밍과 일반 응답을 같은 기준으로 세도록 로컬 토크나이저 사용)
+def count_llm_tokens(messages, answer):
+    TOKENS.inc(sum(count_tokens(message["content"]) for message in messages), kind="prompt")
+    TOKENS.inc(count_tokens(answer), kind="completion")
+
+# 서버에 저장된 세션 대화 상태를 프롬프트용 메시지 목록으로 변환
+# 세션 저장소(SQLite) 작업은 잠금 대기 중에도 이벤트 루프를 막지 않도록 스레드에서 실행
+async def session_conversation(request):
+    if request.conversation or not request.session_id or not request.include_history:
+        return request.conversation
+    summary, recent = await asyncio.to_thread(session_memory.context, request.session_id)
+    conversation = []
+    if summary:
+        conversation.append({"role": "system", "content": f"이전 대화 요약:\n{summary}"})
+    conversation.extend(recent)
+    return conversation
+
+# 오래된 대화를 요약에 반영 (요약 전용 모델 사용)
+async def summarize_turns(api_key, summary, messages):
+    llm = build_llm(api_key, model=SUMMARY_MODEL)
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    prompt = (
+        "다음은 창업 상담 대화의 기존 요약과 그 이후의 대화야. "
+        "질문자의 상황, 창업 아이템, 결정된 사항, 남은 질문을 중심으로 "
+        f"{SESSION_TOKEN_BUDGET // 2} 토큰 이내의 한국어 요약으로 갱신해줘.\n\n"
+        f"[기존 요약]\n{summary or '(없음)'}\n\n[이후 대화]\n{transcript}"
+    )
+    response = await run_stage("요약", llm.ainvoke([{"role": "user", "content": prompt}]), LLM_TIMEOUT)
+    return response.content
+
+# 이번 질문/답변을 세션에 기록하고 필요하면 백그라운드에서 요약 갱신
+background_tasks = set()
+
+async def record_turn(api_key, session_id, question, answer):
+    if not session_id or not answer:
+        return
+    await asyncio.to_thread(session_memory.add_turn, session_id, question, answer)
+    task = asyncio.create_task(session_memory.update_summary(session_id, partial(summarize_turns, api_key)))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+# 같은 질문이 동시에 들어오면 답변 생성은 한 번만 하고 결과를 함께 받음 (빠른 질문 버튼 등)
+generations = SingleFlight()
+
+# 동시에 진행 중인 생성을 합칠 수 있는 키: 정규화된 질문 + 대화 이력 + 인덱스 버전 + 프롬프트 (답변 캐시와 같은 기준)
+# + API 키 해시: 생성은 먼저 온 요청의 키로 호출되므로 키가 다른 요청끼리는 합치지 않음
+# (잘못된 키나 한도 초과 키의 401/429를 다른 사용자가 받거나, 다른 사용자의 키로 만든 답변을 받지 않도록)
+async def generation_key(api_key, question, conversation, timer, endpoint):
+    _, index_version, _ = await get_vectorstore(api_key, timer)
+    return (
+        endpoint, client_pool.key_hash(api_key),
+        answer_cache.namespace(index_version, prompt_hash, conversation), normalize_question(question),
+    )
+
+# 답변 한 개를 생성하는 작업 (같은 키의 요청들이 공유): (답변, 인덱스 버전, 캐시 사용 여부) 하나를 내보냄
+async def produce_answer(api_key, question, conversation, timer):
+    cached_answer, query_vector = await lookup_answer_cache(api_key, question, conversation, timer)
+    if cached_answer is not None:
+        yield cached_answer, index_manager.version, True
+        return
+
+    llm = build_llm(api_key)
+    messages, index_version, query_vector = await build_messages(api_key, question, conversation, timer, query_vector)
+
+    # LLM에게 메시지 전달 (이벤트 루프를 막지 않도록 비동기 호출)
+    with timer.measure("llm"):
+        response = await run_stage("LLM", llm.ainvoke(messages), LLM_TIMEOUT)
 
     answer = response.content
+    count_llm_tokens(messages, answer)
+    store_answer(question, conversation, index_version, query_vector, answer)
+    yield answer, index_version, False
+
+# 응답 생성 함수: 기존 대화 내역을 포함해서 응답 생성 
+# timer에는 단계별 처리 시간이 기록됨 (Server-Timing 헤더용)
+async def generate_response(api_key, question, conversation, session_id=None, timer=None):
+    timer = timer or StageTimer(STAGE_SECONDS)
+    key = await generation_key(api_key, question, conversation, timer, "ask")
+    joined = time.perf_counter()
+    flight, leader = generations.join(key, partial(produce_answer, api_key, question, conversation, timer))
+    async for answer, index_version, cached in flight.subscribe():
+        pass
+    if not leader:
+        # 다른 요청의 생성을 기다린 시간
+        COALESCED.inc(endpoint="ask")
+        timer.record("coalesced", time.perf_counter() - joined)
+    await record_turn(api_key, session_id, question, answer)
+    timer.finish()
+    return answer, index_version, cached
+
+# 스트리밍 답변을 생성하는 작업 (같은 키의 요청들이 공유): meta → token ... → done 이벤트를 내보냄
+async def produce_stream(api_key, question, conversation, timer):
+    llm = build_llm(api_key, streaming=True)
+    try:
+        cached_answer, query_vector = await lookup_answer_cache(api_key, question, conversation, timer)
+        if cached_answer is not None:
+            # 캐시된 답변은 토큰 하나로 바로 전달
+            index_version = index_manager.version
+            yield {"type": "meta", "question": question, "index_version": index_version, "cached": True}
+            yield {"type": "token", "content": cached_answer}
+            yield {"type": "done", "answer": cached_answer, "index_version": index_version, "cached": True}
+            return
+        messages, index_version, query_vector = await build_messages(
+            api_key, question, conversation, timer, query_vector
+        )
+    except HTTPException as e:
+        yield {"type": "error", "detail": e.detail}
+        return
+    yield {"type": "meta", "question": question, "index_version": index_version, "cached": False}
+
+    answer = ""
+    llm_started = time.perf_counter()
+    chunks = llm.astream(messages).__aiter__()
+    try:
+        while True:
+            try:
+                # 다음 토큰을 기다리는 시간에 LLM 타임아웃 적용
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=LLM_TIMEOUT)
+            except StopAsyncIteration:
+                break
+            if not chunk.content:
+                continue
+            if not answer:
+                timer.record("llm_ttft", time.perf_counter() - llm_started)
+            answer += chunk.content
+            yield {"type": "token", "content": chunk.content}
+    except asyncio.TimeoutError:
+        yield {"type": "error", "detail": f"LLM 단계 시간 초과 ({LLM_TIMEOUT}초)"}
+        return
+    finally:
+        await chunks.aclose()
+        timer.record("llm", time.perf_counter() - llm_started)
+
+    count_llm_tokens(messages, answer)
+    store_answer(question, conversation, index_version, query_vector, answer)
+    yield {"type": "done", "answer": answer, "index_version": index_version, "cached": False}
+
+# 스트리밍 응답 함수: 생성 작업의 이벤트를 NDJSON으로 전달 (같은 질문이 진행 중이면 그 스트림을 처음부터 함께 받음)
+# 헤더는 첫 이벤트보다 먼저 전송되므로 단계별 처리 시간은 done 이벤트의 timings로 전달
+async def stream_response(api_key, question, conversation, session_id=None, timer=None):
+    timer = timer or StageTimer(STAGE_SECONDS)
+    started = timer.started
+    try:
+        key = await generation_key(api_key, question, conversation, timer, "stream")
+    except HTTPException as e:
+        yield ndjson({"type": "error", "detail": e.detail})
+        return
+    joined = time.perf_counter()
+    flight, leader = generations.join(key, partial(produce_stream, api_key, question, conversation, timer))
+    if not leader:
+        COALESCED.inc(endpoint="stream")
+
+    ttft_ms = None
+    try:
+        async for event in flight.subscribe():
+            if event["type"] == "token" and ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+            elif event["type"] == "done":
+                await record_turn(api_key, session_id, question, event["answer"])
+                REQUESTS.inc(endpoint="stream", cached=str(event["cached"]).lower())
+                if not leader:
+                    timer.record("coalesced", time.perf_counter() - joined)
+                timer.finish()
+                total_ms = (time.perf_counter() - started) * 1000
+                logger.debug("스트리밍 응답 완료: ttft=%.0fms total=%.0fms", ttft_ms or total_ms, total_ms)
+                event = {
+                    **event,
+                    "ttft_ms": ttft_ms or total_ms,
+                    "total_ms": total_ms,
+                    "coalesced": not leader,
+                    "timings": timer.milliseconds(),
+                }
+            yield ndjson(event)
+    except Exception as e:
+        yield ndjson({"type": "error", "detail": str(e)})
+
+# NDJSON 한 줄로 직렬화
+def ndjson(event):
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+# 여러 질문의 임베딩을 한 번의 배치 호출로 계산해서 (질문 수, 차원) 행렬로 반환 (디스크 임베딩 캐시에 있는 질문은 생략)
+# BM25 색인이 있으면 임베딩이 느리거나 실패할 때 None을 반환해서 키워드 검색만 사용 (embed_question과 같은 기준)
+async def embed_questions(api_key, questions, timer, lexical=None):
+    if not questions or (lexical is not None and RETRIEVAL_MODE == "lexical"):
+        return None
+    with timer.measure("batch_embed"):
+        if local_embeddings is not None:
+            return local_embeddings.embed_array(questions)
+        embeddings = get_embeddings(api_key)
+        if lexical is None or RETRIEVAL_MODE == "vector":
+            vectors = await run_stage("임베딩", embeddings.aembed_documents(questions), EMBED_TIMEOUT)
+        else:
+            try:
+                vectors = await run_stage(
+                    "임베딩", embeddings.aembed_documents(questions), min(EMBED_TIMEOUT, LEXICAL_FALLBACK_TIMEOUT)
+                )
+            except Exception as e:
+                logger.warning("일괄 질의 임베딩 실패, 키워드 검색만 사용: %s", getattr(e, "detail", e))
+                return None
+    return np.asarray(vectors, dtype=np.float32)
+
+# 일괄 응답 함수: 답변 캐시 확인 → 남은 질문을 한 번에 임베딩 → 질의 행렬로 한 번에 검색 →
+# 컨텍스트 구성과 LLM 호출은 concurrency개까지 동시에 실행하고 끝나는 순서대로 result 이벤트 전달, 마지막에 done 이벤트
+# 대화 이력 없이 독립적으로 답변하며, 정규화하면 같은 질문은 한 번만 생성해서 모든 위치에 같은 답변 전달
+async def batch_response(api_key, questions, concurrency):
+    timer = StageTimer(STAGE_SECONDS)
+    started = timer.started
+    counts = {"cached": 0, "generated": 0, "errors": 0}
+
+    def elapsed_ms():
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    # 같은 질문이 여러 위치에 있으면 위치마다 이벤트 한 줄
+    def result(positions, answer, cached):
+        lines = []
+        for position in positions:
+            counts["cached" if cached else "generated"] += 1
+            REQUESTS.inc(endpoint="batch", cached=str(cached).lower())
+            lines.append(ndjson({
+                "type": "result", "index": position, "question": questions[position], "answer": answer,
+                "index_version": index_version, "cached": cached, "ms": elapsed_ms(),
+            }))
+        return "".join(lines)
+
+    def failure(positions, detail):
+        counts["errors"] += len(positions)
+        return "".join(
+            ndjson({"type": "error", "index": position, "question": questions[position], "detail": detail})
+            for position in positions
+        )
+
+    def done():
+        timer.record("batch_total", time.perf_counter() - started)
+        total_ms = elapsed_ms()
+        logger.debug("일괄 응답 완료: %d개 질문, total=%.0fms", len(questions), total_ms)
+        return ndjson({
+            "type": "done", "questions": len(questions), **counts, "index_version": index_version,
+            "total_ms": total_ms, "questions_per_second": round(len(questions) / max(total_ms / 1000, 1e-9), 2),
+            "timings": timer.milliseconds(),
+        })
+
+    try:
+        vectorstore, index_version, lexical = await get_vectorstore(api_key, timer)
+    except HTTPException as e:
+        yield ndjson({"type": "error", "detail": e.detail})
+        return
+    namespace = answer_cache.namespace(index_version, prompt_hash, [])
+    groups = {}
+    for position, question in enumerate(questions):
+        groups.setdefault(normalize_question(question), []).append(position)
 
-    return answer
+    # 같은 질문이 캐시에 있으면 바로 전달
+    pending, hits = [], []
+    with timer.measure("batch_cache"):
+        for positions in groups.values():
+            answer = answer_cache.get_exact(namespace, questions[positions[0]])
+            if answer is None:
+                pending.append(positions)
+            else:
+                hits.append((positions, answer))
+    for positions, answer in hits:
+        yield result(positions, answer, True)
+
+    pending_questions = [questions[positions[0]] for positions in pending]
+    try:
+        query_vectors = await embed_questions(api_key, pending_questions, timer, lexical)
+    except Exception as e:
+        for positions in pending:
+            yield failure(positions, getattr(e, "detail", str(e)))
+        yield done()
+        return
+
+    # 임베딩이 거의 같은 질문이 캐시에 있으면 바로 전달
+    if query_vectors is not None and pending:
+        rows, hits = [], []
+        with timer.measure("batch_cache"):
+            for row, positions in enumerate(pending):
+                answer = answer_cache.get_similar(namespace, query_vectors[row].tolist())
+                if answer is None:
+                    rows.append(row)
+                else:
+                    hits.append((positions, answer))
+        for positions, answer in hits:
+            yield result(positions, answer, True)
+        pending = [pending[row] for row in rows]
+        pending_questions = [pending_questions[row] for row in rows]
+        query_vectors = query_vectors[rows]
+    if not pending:
+        yield done()
+        return
+
+    # 남은 질문 전체를 FAISS 한 번의 다중 질의 검색으로 처리
+    loop = asyncio.get_running_loop()
+    try:
+        with timer.measure("batch_search"):
+            relevant_docs = await run_stage(
+                "검색",
+                loop.run_in_executor(
+                    retrieval_executor,
+                    partial(
+                        hybrid_search_batch, vectorstore, lexical if RETRIEVAL_MODE != "vector" else None,
+                        pending_questions, query_vectors, k=CONTEXT_CANDIDATES, candidates=RETRIEVAL_CANDIDATES,
+                        nprobe=INDEX_NPROBE, ef_search=INDEX_EF_SEARCH,
+                    ),
+                ),
+                SEARCH_TIMEOUT,
+            )
+    except HTTPException as e:
+        for positions in pending:
+            yield failure(positions, e.detail)
+        yield done()
+        return
+
+    llm = build_llm(api_key)
+    semaphore = asyncio.Semaphore(concurrency)
+    prompts = [None] * len(pending)
+
+    # 동시 실행 수 제한 안에서 답변 하나 생성: (행 번호, 답변, 오류 내용)
+    # 컨텍스트 구성(토큰 계산)은 질문마다 스레드에서 실행해서 다른 질문의 LLM 대기 시간과 겹치게 함
+    async def generate(row):
+        async with semaphore:
+            with timer.measure("context"):
+                prompts[row] = await asyncio.to_thread(compose_messages, pending_questions[row], [], relevant_docs[row])
+            log_prompt(prompts[row])
+            try:
+                with timer.measure("llm"):
+                    response = await run_stage("LLM", llm.ainvoke(prompts[row]), LLM_TIMEOUT)
+            except HTTPException as e:
+                return row, None, e.detail
+            except Exception as e:
+                return row, None, str(e)
+        return row, response.content, None
+
+    tasks = [asyncio.create_task(generate(row)) for row in range(len(pending))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            row, answer, detail = await next_done
+            if detail is not None:
+                yield failure(pending[row], detail)
+                continue
+            count_llm_tokens(prompts[row], answer)
+            query_vector = query_vectors[row].tolist() if query_vectors is not None else None
+            store_answer(pending_questions[row], [], index_version, query_vector, answer)
+            yield result(pending[row], answer, False)
+    finally:
+        # 클라이언트 연결이 끊기면 남은 LLM 호출 취소
+        for task in tasks:
+            task.cancel()
+    yield done()
 
 # 엔드포인트 정의
 @app.post("/ask")
-async def ask_question(request: QueryRequest):
+async def ask_question(request: QueryRequest, response: Response):
     api_key = request.api_key
     question = request.question
-    conversation = request.conversation
-    answer = generate_response(api_key, question, conversation)
-    return {"question": question, "answer": answer}
+    conversation = await session_conversation(request)
+    timer = StageTimer(STAGE_SECONDS)
+    answer, index_version, cached = await generate_response(
+        api_key, question, conversation, request.session_id, timer
+    )
+    REQUESTS.inc(endpoint="ask", cached=str(cached).lower())
+    response.headers["Server-Timing"] = timer.server_timing()
+    return {"question": question, "answer": answer, "index_version": index_version, "cached": cached}
+
+# 스트리밍 엔드포인트: meta → token ... → done 순서의 NDJSON 이벤트
+@app.post("/ask/stream")
+async def ask_question_stream(request: QueryRequest):
+    return StreamingResponse(
+        stream_response(request.api_key, request.question, await session_conversation(request), request.session_id),
+        media_type="application/x-ndjson",
+    )
+
+# 일괄 질문 엔드포인트: 질문마다 끝나는 순서대로 result (또는 error) 이벤트, 마지막에 done 이벤트 (NDJSON)
+# 평가용 질문 세트 실행이나 자주 묻는 질문의 답변 캐시 미리 채우기에 사용 (python ask_batch.py)
+@app.post("/ask/batch")
+async def ask_question_batch(request: BatchQueryRequest):
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="질문이 없습니다")
+    if len(request.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413, detail=f"한 번에 최대 {BATCH_MAX_QUESTIONS}개 질문까지 보낼 수 있습니다"
+        )
+    concurrency = max(1, min(request.concurrency or BATCH_LLM_CONCURRENCY, BATCH_LLM_CONCURRENCY))
+    return StreamingResponse(
+        batch_response(request.api_key, request.questions, concurrency), media_type="application/x-ndjson"
+    )
+
+# 세션 대화 상태 삭제 (히스토리 삭제 시 호출)
+@app.delete("/session/{session_id}")
+async def clear_session(session_id: str):
+    await asyncio.to_thread(session_memory.clear, session_id)
+    return {"session_id": session_id, "cleared": True}
+
+# 현재 로드된 인덱스 버전 확인
+@app.get("/index")
+async def index_info():
+    return {"loaded": index_manager.is_loaded(), "index_version": index_manager.version}
+
+# Prometheus 형식 지표 (uvicorn 워커가 여러 개면 응답한 워커의 값)
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        render_metrics([STAGE_SECONDS, TOKENS, REQUESTS, COALESCED, ANSWER_CACHE_LOOKUPS, EMBEDDING_CACHE_LOOKUPS]),
+        media_type="text/plain; version=0.0.4",
+    )
+
+# 프로세스가 살아 있는지 확인 (인덱스 로드 여부와 무관)
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+# 요청을 받을 준비가 됐는지 확인: 인덱스 로드와 워밍업 검색이 끝나야 200, 그 전에는 503
+@app.get("/ready")
+async def ready():
+    if index_manager.is_ready():
+        return {"ready": True, "index_version": index_manager.version}
+    if index_manager.load_error:
+        reason = index_manager.load_error
+    elif os.path.exists(faiss_file):
+        reason = "loading"
+    else:
+        reason = "인덱스가 없습니다 (python build_index.py로 생성)"
+    return JSONResponse(status_code=503, content={"ready": False, "reason": reason})
 
 # 서버 실행
 if __name__ == "__main__":
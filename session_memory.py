@@ -0,0 +1,130 @@
+from context_packer import count_tokens, truncate_to_tokens
+import asyncio
+import os
+import sqlite3
+import threading
+
+# 세션별 대화 상태를 서버에서 관리: 최근 N개 메시지는 그대로, 그 이전은 요약으로 보관
+class SessionMemory:
+    def __init__(self, db_path, recent_messages=6, token_budget=1500, summary_batch=4):
+        self.db_path = db_path
+        self.recent_messages = recent_messages
+        self.token_budget = token_budget
+        # 요약되지 않은 오래된 메시지가 이만큼 쌓이면 요약 갱신
+        self.summary_batch = summary_batch
+        self._local = threading.local()
+        self._summarizing = set()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.init_database()
+
+    # 스레드마다 연결을 하나씩 유지
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def init_database(self):
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS session_turns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_session_turns ON session_turns (session_id, id)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS session_summaries (
+                session_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                summarized_upto INTEGER NOT NULL
+            )
+        ''')
+        conn.commit()
+
+    def _summary(self, session_id):
+        row = self._connection().execute(
+            'SELECT summary, summarized_upto FROM session_summaries WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        return row if row else ("", 0)
+
+    def add_turn(self, session_id, question, answer):
+        """Record one question/answer pair in a single transaction."""
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                'INSERT INTO session_turns (session_id, role, content) VALUES (?, ?, ?)',
+                [(session_id, "user", question), (session_id, "assistant", answer)],
+            )
+
+    def context(self, session_id):
+        """Return (summary, recent messages) for the prompt, within the token budget."""
+        summary, summarized_upto = self._summary(session_id)
+        # 아직 요약에 반영되지 않은 메시지까지 포함해서 최신순으로 조회
+        rows = self._connection().execute(
+            'SELECT role, content FROM session_turns WHERE session_id = ? AND id > ? ORDER BY id DESC LIMIT ?',
+            (session_id, summarized_upto, self.recent_messages + self.summary_batch),
+        ).fetchall()
+
+        # 최신 메시지부터 예산 안에 들어가는 만큼만 포함
+        used = count_tokens(summary) if summary else 0
+        messages = []
+        for role, content in rows:
+            tokens = count_tokens(content)
+            if used + tokens > self.token_budget:
+                break
+            messages.append({"role": role, "content": content})
+            used += tokens
+        messages.reverse()
+        return summary, messages
+
+    def pending_for_summary(self, session_id):
+        """Return (summary, old messages not yet summarized, last id) when a summary update is due."""
+        summary, summarized_upto = self._summary(session_id)
+        rows = self._connection().execute(
+            'SELECT id, role, content FROM session_turns WHERE session_id = ? AND id > ? ORDER BY id',
+            (session_id, summarized_upto),
+        ).fetchall()
+        # 최근 N개를 제외한 나머지가 요약 대상
+        old = rows[:-self.recent_messages] if len(rows) > self.recent_messages else []
+        if len(old) < self.summary_batch:
+            return None
+        return summary, [{"role": role, "content": content} for _, role, content in old], old[-1][0]
+
+    def save_summary(self, session_id, summary, summarized_upto):
+        conn = self._connection()
+        summary = truncate_to_tokens(summary, self.token_budget // 2)
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO session_summaries (session_id, summary, summarized_upto) VALUES (?, ?, ?)',
+                (session_id, summary, summarized_upto),
+            )
+
+    async def update_summary(self, session_id, summarize):
+        """Fold old turns into the rolling summary. summarize(summary, messages) is an async callable."""
+        if session_id in self._summarizing:
+            return
+        # SQLite 조회 / 기록은 스레드에서 실행하므로 기다리는 동안 같은 세션의 요약이 중복 시작되지 않도록 먼저 표시
+        self._summarizing.add(session_id)
+        try:
+            pending = await asyncio.to_thread(self.pending_for_summary, session_id)
+            if pending is None:
+                return
+            summary, messages, last_id = pending
+            new_summary = await summarize(summary, messages)
+            await asyncio.to_thread(self.save_summary, session_id, new_summary, last_id)
+        except Exception as e:
+            print(f"대화 요약 갱신 중 오류 발생: {e}")
+        finally:
+            self._summarizing.discard(session_id)
+
+    def clear(self, session_id):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM session_turns WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM session_summaries WHERE session_id = ?', (session_id,))
@@ -0,0 +1,74 @@
+import asyncio
+
+# 진행 중인 작업 하나의 결과 이벤트 목록: 먼저 나온 이벤트부터 모든 구독자에게 그대로 전달
+class Flight:
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event):
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error=None):
+        self.error = error
+        self.done = True
+        self._notify()
+
+    # 기다리는 구독자를 깨우고 다음 알림용 이벤트로 교체
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self):
+        """Yield every event from the start, then new ones as they arrive. Re-raises the producer's error."""
+        position = 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+# 같은 키의 작업이 이미 진행 중이면 새로 시작하지 않고 그 결과를 함께 받는 single-flight
+# 작업은 요청과 분리된 태스크에서 실행되므로 처음 요청한 클라이언트가 끊겨도 나머지는 결과를 받음
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._tasks = set()
+
+    def join(self, key, start):
+        """Return (flight, leader). start() creates the producer (an async iterator) and runs once per key."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = Flight()
+        self._flights[key] = flight
+        task = asyncio.create_task(self._run(key, flight, start()))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return flight, True
+
+    async def _run(self, key, flight, events):
+        try:
+            async for event in events:
+                flight.publish(event)
+            flight.finish()
+        except Exception as e:
+            flight.finish(e)
+        except BaseException:
+            # 서버 종료 등으로 취소되면 구독자에게는 일반 오류로 전달
+            flight.finish(RuntimeError("작업이 취소되었습니다"))
+            raise
+        finally:
+            # 끝난 작업은 바로 제거 (이후 요청은 답변 캐시를 사용)
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def __len__(self):
+        return len(self._flights)
@@ -3,18 +3,66 @@ import streamlit as st  # Streamlit 웹 애플리케이션 프레임워크
 import sqlite3  # SQLite 데이터베이스 관리
 from datetime import datetime  # 시간 및 날짜 처리
 from openai import OpenAI  # OpenAI API 호출 라이브러리
-import re  # 정규식 처리
 import uuid  # 세션 ID 생성용
+import threading  # 스레드별 데이터베이스 연결 관리
+import re  # 짧은 검색어 강조 표시
+from utils import ThrottledMarkdown  # 스트리밍 답변을 일정 간격으로 모아서 표시
+
+# 자주 쓰는 SQL 문 (연결마다 준비된 문장으로 캐시되어 재사용)
+INSERT_MESSAGE = 'INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)'
+SELECT_MESSAGES = 'SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?'
+# 키셋 페이지네이션: 커서(직전 페이지 마지막 id)보다 오래된 메시지를 (session_id, id) 인덱스에서 바로 탐색
+SELECT_MESSAGES_BEFORE = 'SELECT id, role, content, timestamp FROM messages WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT ?'
+# 첫 페이지 커서 (SQLite 정수 최댓값)
+LATEST_CURSOR = 2 ** 63 - 1
+# 세션 번호를 사용자 정의 영역(U+E000~) 문자 3개로 표현한 세션 키
+# trigram 토큰 하나가 곧 세션 하나가 되므로, 세션 조건이 해당 세션 메시지만 담긴 목록 하나로 좁혀짐
+SESSION_KEY = 'char(57344 + s.id % 6400, 57344 + (s.id / 6400) % 6400, 57344 + s.id / 40960000)'
+SELECT_SESSION_KEY = f'SELECT {SESSION_KEY} FROM chat_sessions s WHERE s.session_id = ?'
+# 전문 검색: FTS5 trigram 색인에서 세션과 검색어를 함께 매칭하고, 강조 표시와 발췌는 SQLite가 생성
+SEARCH_MESSAGES = '''
+    SELECT m.role, highlight(messages_fts, 0, '**', '**'), snippet(messages_fts, 0, '**', '**', '…', 64), m.timestamp
+    FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+    WHERE messages_fts MATCH ?
+    ORDER BY bm25(messages_fts, 1.0, 0.0) LIMIT ? OFFSET ?
+'''
+# trigram 색인으로 찾을 수 없는 2글자 이하 검색어(또는 FTS5 미지원 환경)는 세션 인덱스 범위 안에서만 부분 일치 검색
+# LIKE는 ASCII 대소문자를 구분하지 않으므로 강조 표시와 발췌는 같은 규칙(_short_query_pattern)으로 Python에서 생성
+SEARCH_MESSAGES_SHORT = '''
+    SELECT role, content, timestamp
+    FROM messages
+    WHERE session_id = :session_id AND content LIKE :pattern ESCAPE '\\'
+    ORDER BY id DESC LIMIT :limit OFFSET :offset
+'''
 
 # 채팅 히스토리를 관리하는 클래스
 class ChatHistoryManager:
+    # 프로세스 안에서 이미 초기화한 데이터베이스 경로 → FTS5 색인 사용 가능 여부 (재실행마다 스키마를 다시 만들지 않도록)
+    _initialized = {}
+    _init_lock = threading.Lock()
+
     def __init__(self, db_path='chat_history.db'):
         self.db_path = db_path
-        self.init_database()  # 데이터베이스 초기화
+        self._local = threading.local()
+        with self._init_lock:
+            if db_path not in self._initialized:
+                self._initialized[db_path] = self.init_database()  # 데이터베이스 초기화
+        self.fts_enabled = self._initialized[db_path]
+
+    # 스레드마다 오래 유지되는 연결 (WAL 모드)
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
 
     # 데이터베이스 초기화 메서드
     def init_database(self):
-        with sqlite3.connect(self.db_path) as conn:
+        conn = self._connection()
+        with conn:
             cursor = conn.cursor()
             # 메시지 저장용 테이블 생성
             cursor.execute('''
@@ -26,47 +74,145 @@ class ChatHistoryManager:
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
-            conn.commit()
+            # 세션별 조회가 테이블 크기와 무관하도록 (session_id, id) 복합 인덱스 생성
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages (session_id, id)')
+        return self.init_search_index()
+
+    # 검색용 FTS5 가상 테이블 생성 (trigram 토크나이저로 한국어 부분 문자열 검색 지원)
+    def init_search_index(self):
+        conn = self._connection()
+        try:
+            with conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+                ).fetchone()
+                # 세션마다 정수 번호를 부여해 색인용 세션 키로 사용
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS chat_sessions (
+                        id INTEGER PRIMARY KEY,
+                        session_id TEXT NOT NULL UNIQUE
+                    )
+                ''')
+                # 색인 원본 뷰: 메시지 본문 + 세션 키 (본문을 중복 저장하지 않는 외부 콘텐츠 방식)
+                conn.execute(f'''
+                    CREATE VIEW IF NOT EXISTS messages_search AS
+                    SELECT m.id, m.content, {SESSION_KEY} AS session_key
+                    FROM messages m JOIN chat_sessions s ON s.session_id = m.session_id
+                ''')
+                conn.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                        content, session_key, content='messages_search', content_rowid='id', tokenize='trigram'
+                    )
+                ''')
+                # messages 변경 시 색인을 함께 갱신하는 트리거
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                        INSERT OR IGNORE INTO chat_sessions (session_id) VALUES (new.session_id);
+                        INSERT INTO messages_fts (rowid, content, session_key)
+                        SELECT new.id, new.content, {SESSION_KEY} FROM chat_sessions s WHERE s.session_id = new.session_id;
+                    END
+                ''')
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                        INSERT INTO messages_fts (messages_fts, rowid, content, session_key)
+                        SELECT 'delete', old.id, old.content, {SESSION_KEY} FROM chat_sessions s WHERE s.session_id = old.session_id;
+                    END
+                ''')
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE ON messages BEGIN
+                        INSERT INTO messages_fts (messages_fts, rowid, content, session_key)
+                        SELECT 'delete', old.id, old.content, {SESSION_KEY} FROM chat_sessions s WHERE s.session_id = old.session_id;
+                        INSERT OR IGNORE INTO chat_sessions (session_id) VALUES (new.session_id);
+                        INSERT INTO messages_fts (rowid, content, session_key)
+                        SELECT new.id, new.content, {SESSION_KEY} FROM chat_sessions s WHERE s.session_id = new.session_id;
+                    END
+                ''')
+                # 기존 데이터베이스라면 이미 저장된 메시지를 색인에 반영
+                if not exists:
+                    conn.execute('''
+                        INSERT OR IGNORE INTO chat_sessions (session_id)
+                        SELECT DISTINCT session_id FROM messages WHERE session_id IS NOT NULL
+                    ''')
+                    conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError as e:
+            # FTS5/trigram을 지원하지 않는 SQLite라면 부분 일치 검색으로 동작
+            print(f"전문 검색 색인 생성 중 오류 발생 (부분 일치 검색 사용): {e}")
+            return False
 
     # 메시지 추가
     def add_message(self, role, content, session_id):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                'INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)',
-                (session_id, role, content)
-            )
-            conn.commit()
+        conn = self._connection()
+        with conn:
+            conn.execute(INSERT_MESSAGE, (session_id, role, content))
+
+    # 한 번의 대화(질문 + 답변)를 하나의 트랜잭션으로 저장
+    def add_turn(self, question, answer, session_id):
+        conn = self._connection()
+        with conn:
+            conn.executemany(INSERT_MESSAGE, [(session_id, "user", question), (session_id, "assistant", answer)])
 
     # 특정 세션의 메시지 가져오기
     def get_messages(self, session_id, limit=50):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY timestamp DESC LIMIT ?',
-                (session_id, limit)
-            )
-            return cursor.fetchall()
-
-    # 특정 키워드로 메시지 검색
-    def search_messages(self, query, session_id):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT role, content, timestamp FROM messages WHERE session_id = ? AND content LIKE ? ORDER BY timestamp DESC',
-                (session_id, f'%{query}%')
-            )
-            return cursor.fetchall()
+        return self._connection().execute(SELECT_MESSAGES, (session_id, limit)).fetchall()
+
+    # 히스토리 한 페이지 조회: 최신순 (id, role, content, timestamp) 목록과 다음 페이지 커서(없으면 None) 반환
+    # OFFSET 없이 id 커서로 이어 읽으므로 깊은 페이지도 첫 페이지와 같은 비용
+    def get_messages_page(self, session_id, cursor=None, limit=20):
+        rows = self._connection().execute(
+            SELECT_MESSAGES_BEFORE, (session_id, LATEST_CURSOR if cursor is None else cursor, limit + 1)
+        ).fetchall()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, rows[-1][0]
+        return rows, None
+
+    # 특정 키워드로 메시지 검색: (role, 강조 표시된 본문, 발췌, timestamp) 목록을 관련도 순으로 반환
+    def search_messages(self, query, session_id, limit=20, offset=0):
+        query = query.strip()
+        if not query:
+            return []
+        # trigram은 3글자 이상이어야 매칭되므로 짧은 검색어는 부분 일치 검색으로
+        if self.fts_enabled and len(query) >= 3:
+            conn = self._connection()
+            row = conn.execute(SELECT_SESSION_KEY, (session_id,)).fetchone()
+            if row is None:
+                return []
+            # 세션 키와 검색어를 각각 구문(phrase)으로 묶어 FTS5 문법 문자를 무력화
+            match = f'session_key : {_fts_phrase(row[0])} AND content : {_fts_phrase(query)}'
+            return conn.execute(SEARCH_MESSAGES, (match, limit, offset)).fetchall()
+        pattern = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        rows = self._connection().execute(SEARCH_MESSAGES_SHORT, {
+            "pattern": f'%{pattern}%',
+            "session_id": session_id,
+            "limit": limit,
+            "offset": offset,
+        }).fetchall()
+        matcher = _short_query_pattern(query)
+        results = []
+        for role, content, timestamp in rows:
+            found = matcher.search(content)
+            start = max(found.start() - 40, 0) if found else 0
+            snippet = content[start:start + 100]
+            results.append((role, matcher.sub(r'**\g<0>**', content), matcher.sub(r'**\g<0>**', snippet), timestamp))
+        return results
 
     # 히스토리 초기화 (특정 세션 또는 전체 삭제)
     def clear_history(self, session_id=None):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        conn = self._connection()
+        with conn:
             if session_id:
-                cursor.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+                conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
             else:
-                cursor.execute('DELETE FROM messages')
-            conn.commit()
+                conn.execute('DELETE FROM messages')
+
+# 짧은 검색어 강조용 정규식: SQLite LIKE와 같이 ASCII 문자만 대소문자를 구분하지 않음
+def _short_query_pattern(query):
+    return re.compile(re.escape(query), re.IGNORECASE | re.ASCII)
+
+# FTS5 검색식 안에서 문자열을 하나의 구문으로 취급하도록 따옴표로 감싸기
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
 
 # OpenAI API를 호출하여 AI 응답 생성
 def generate_ai_response(client, messages, history_manager):
@@ -79,25 +225,88 @@ def generate_ai_response(client, messages, history_manager):
             {"role": msg["role"], "content": msg["content"]} for msg in messages[-10:]
         ])
         # AI 응답을 스트리밍 방식으로 가져오기
-        full_response = ""
-        message_placeholder = st.empty()  # 실시간 응답 표시를 위한 플레이스홀더
+        renderer = ThrottledMarkdown(st.empty())  # 실시간 응답 표시를 위한 플레이스홀더
         stream = client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=context_messages,
             stream=True
         )
-        # 스트리밍된 응답을 실시간으로 화면에 출력
+        # 스트리밍된 응답을 일정 간격으로 모아서 화면에 출력
         for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
-                full_response += chunk.choices[0].delta.content
-                message_placeholder.markdown(full_response + "▌")  # 진행 중인 응답 표시
-        message_placeholder.markdown(full_response)  # 최종 응답 표시
-        return full_response
+            if chunk.choices and chunk.choices[0].delta.content is not None:
+                renderer.append(chunk.choices[0].delta.content)
+        renderer.finish()  # 최종 응답 표시
+        return renderer.text
     except Exception as e:
         # 오류 발생 시 경고 메시지 출력
         st.error(f"AI 응답 생성 중 오류 발생: {e}")
         return None
 
+# 저장된 히스토리를 한 페이지씩 표시 (필요할 때만 다음 페이지를 조회)
+def show_history_page(history_manager, session_id, page_size=20):
+    # 지금까지 지나온 페이지의 커서 목록 (마지막 항목이 현재 페이지), 세션이 바뀌면 첫 페이지부터
+    if "history_cursors" not in st.session_state or st.session_state.get("history_session_id") != session_id:
+        st.session_state.history_session_id = session_id
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+
+    messages, next_cursor = history_manager.get_messages_page(session_id, cursors[-1], limit=page_size)
+    if not messages:
+        st.info("저장된 대화가 없습니다.")
+    for _, role, content, timestamp in messages:
+        formatted_timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M")
+        if role == "user":
+            st.markdown(f"**👤 사용자 [{formatted_timestamp}]:**\n{content}")
+        else:
+            st.markdown(f"**🤖 AI [{formatted_timestamp}]:**\n{content}")
+        st.divider()
+
+    # 페이지 이동
+    newer_col, page_col, older_col = st.columns([1, 2, 1])
+    if newer_col.button("최근 대화", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    page_col.caption(f"{len(cursors)} 페이지")
+    if older_col.button("이전 대화", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+
+# 검색 결과를 페이지 단위로 표시 (강조 표시와 발췌는 SQLite에서 생성된 것을 그대로 사용)
+def show_search_results(history_manager, search_query, session_id, page_size=10):
+    # 검색어가 바뀌면 첫 페이지부터
+    if st.session_state.get("search_query") != search_query:
+        st.session_state.search_query = search_query
+        st.session_state.search_page = 0
+    page = st.session_state.search_page
+
+    # 다음 페이지 존재 여부를 알기 위해 한 건 더 조회
+    results = history_manager.search_messages(search_query, session_id, limit=page_size + 1, offset=page * page_size)
+    has_next = len(results) > page_size
+    st.subheader(f"'{search_query}' 검색 결과")
+    if not results:
+        st.info("검색 결과가 없습니다.")
+        return
+    for role, highlighted_content, snippet, timestamp in results[:page_size]:
+        formatted_timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M")
+        if role == "user":
+            st.markdown(f"**👤 사용자 [{formatted_timestamp}]:**\n{snippet}")
+        else:
+            st.markdown(f"**🤖 AI [{formatted_timestamp}]:**\n{snippet}")
+        if snippet != highlighted_content:
+            with st.expander("전체 보기"):
+                st.markdown(highlighted_content)
+        st.divider()
+
+    # 페이지 이동
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    if prev_col.button("이전", disabled=page == 0):
+        st.session_state.search_page -= 1
+        st.rerun()
+    page_col.caption(f"{page + 1} 페이지")
+    if next_col.button("다음", disabled=not has_next):
+        st.session_state.search_page += 1
+        st.rerun()
+
 # 애플리케이션 소개 섹션
 def show_intro():
     with st.expander("📖 제주 창업 계획 도우미 사용 가이드 (펼쳐보기)"):
@@ -111,7 +320,7 @@ def show_intro():
            - 질문에 대한 AI 응답을 실시간으로 확인하세요.
         2. **채팅 히스토리**
            - 이전에 나눴던 대화를 확인할 수 있습니다.
-           - 최대 100개의 최근 대화 내용을 표시합니다.
+           - 최근 대화부터 한 페이지씩 표시하며, 이전 대화 버튼으로 더 오래된 대화를 불러옵니다.
         3. **히스토리 검색**
            - 특정 키워드로 과거 대화를 검색할 수 있습니다.
            - 검색된 메시지에서 키워드가 하이라이트 처리되어 표시됩니다.
@@ -142,6 +351,16 @@ def show_intro():
         """)
 
 # 메인 애플리케이션 로직
+# 재실행마다 새로 만들지 않고 프로세스에서 하나만 사용하는 리소스
+@st.cache_resource
+def get_history_manager():
+    return ChatHistoryManager()
+
+# API 키별 OpenAI 클라이언트 (연결 재사용, 오래 쓰지 않은 키는 제거)
+@st.cache_resource(max_entries=16, ttl=3600)
+def get_openai_client(api_key):
+    return OpenAI(api_key=api_key)
+
 def main():
     st.set_page_config(page_title="제주도 창업 계획", page_icon="🏝️")
     st.title("🏝️ 제주도 창업 계획 도우미")
@@ -156,12 +375,12 @@ def main():
     session_id = st.session_state.session_id
 
     # 히스토리 관리자 초기화
-    history_manager = ChatHistoryManager()
+    history_manager = get_history_manager()
 
     # OpenAI API 키 입력 섹션
     st.sidebar.header("🔑 OpenAI API Key")
     api_key = st.sidebar.text_input("Enter your OpenAI API Key", type="password")
-    client = OpenAI(api_key=api_key) if api_key else None
+    client = get_openai_client(api_key) if api_key else None
 
     # 메시지 상태 초기화
     if 'messages' not in st.session_state:
@@ -219,19 +438,12 @@ def main():
     elif menu == "채팅 히스토리":
         # 저장된 채팅 히스토리 표시
         st.header("📜 채팅 히스토리")
-        messages = history_manager.get_messages(session_id, limit=100)
-        for msg in messages:
-            role, content, timestamp = msg
-            formatted_timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M")
-            if role == "user":
-                st.markdown(f"**👤 사용자 [{formatted_timestamp}]:**\n{content}")
-            else:
-                st.markdown(f"**🤖 AI [{formatted_timestamp}]:**\n{content}")
-            st.divider()
-        
+        show_history_page(history_manager, session_id)
+
         # 히스토리 삭제 버튼
         if st.button("전체 히스토리 삭제"):
             history_manager.clear_history(session_id)
+            st.session_state.history_cursors = [None]
             st.success("채팅 히스토리가 삭제되었습니다.")
 
     elif menu == "히스토리 검색":
@@ -239,25 +451,7 @@ def main():
         st.header("🔍 히스토리 검색")
         search_query = st.text_input("검색어를 입력하세요")
         if search_query:
-            results = history_manager.search_messages(search_query, session_id)
-            st.subheader(f"'{search_query}' 검색 결과")
-            if results:
-                for msg in results:
-                    role, content, timestamp = msg
-                    formatted_timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").strftime("%Y-%m-%d %H:%M")
-                    highlighted_content = re.sub(
-                        f'({re.escape(search_query)})',
-                        r'**\1**',
-                        content,
-                        flags=re.IGNORECASE
-                    )
-                    if role == "user":
-                        st.markdown(f"**👤 사용자 [{formatted_timestamp}]:**\n{highlighted_content}")
-                    else:
-                        st.markdown(f"**🤖 AI [{formatted_timestamp}]:**\n{highlighted_content}")
-                    st.divider()
-            else:
-                st.info("검색 결과가 없습니다.")
+            show_search_results(history_manager, search_query, session_id)
 
 # 프로그램 실행
 if __name__ == "__main__":
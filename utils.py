@@ -1,16 +1,49 @@
 #사용 라이브러리 가져오기
 import streamlit as st
 from langchain_core.callbacks.base import BaseCallbackHandler
+import time
+
+# 스트리밍 답변 렌더링: 토큰마다 전체 답변을 다시 그리면 답변 길이에 대해 제곱으로 느려지므로
+# 토큰을 모아두었다가 일정 시간 간격(interval초) 또는 일정 글자 수(max_pending)가 쌓일 때만 화면 갱신
+class ThrottledMarkdown:
+    def __init__(self, container, initial_text="", interval=0.1, max_pending=400, cursor="▌"):
+        self.container = container
+        self.text = initial_text
+        self.interval = interval
+        self.max_pending = max_pending
+        self.cursor = cursor
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def append(self, token):
+        self.text += token
+        self._pending += len(token)
+        if self._pending >= self.max_pending or time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.container.markdown(self.text + self.cursor)
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def finish(self):
+        """Render the final text once, without the cursor."""
+        self.container.markdown(self.text)
 
 #text streaming
 class StreamHandler(BaseCallbackHandler):
     def __init__ (self, container, initial_text=""):
-        self.container = container
-        self.text = initial_text
+        self.renderer = ThrottledMarkdown(container, initial_text)
+
+    @property
+    def text(self):
+        return self.renderer.text
     
     def on_llm_new_token(self, token: str, **kwargs) -> None:
-        self.text += token
-        self.container.markdown(self.text)
+        self.renderer.append(token)
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        self.renderer.finish()
 
 # 이전 대화 기록을 출력해주는 함수
 def print_messages():